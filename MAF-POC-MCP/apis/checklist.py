@@ -1,14 +1,16 @@
 
 import asyncio
-from fastapi import APIRouter
+from typing import Optional
+from fastapi import APIRouter, HTTPException
 from fastapi.responses import JSONResponse
 from models.checklist_request import ChecklistRequest
-from models.tool_call_dto import ChecklistProcessingToolCallDto
+from models.tool_call_dto import ChecklistLoadRequestDto
 import logging
 from logger import get_logger
 from agents.main_agent import run_main_agent
 from agents.workflow_initiation_agent import build_checklist_workflow
-from tools.checklist_process import ChecklistProcessor
+from tools.checklist_process import CHECKLIST_JOB, ChecklistProcessor
+from service.job_engine import JobEngine
 
 logger = get_logger(__name__)
 
@@ -18,11 +20,59 @@ router = APIRouter(prefix="/checklist", tags=["checklist"])
 def read_root():
     return {"message": "Microsoft Agent Framework POC API is running."}
 
-@router.post("/load-checklist")
-async def load_checklist(body: ChecklistProcessingToolCallDto):
+@router.post("/load-checklist", status_code=202)
+async def load_checklist(body: ChecklistLoadRequestDto):
+    """Queue a checklist run as a background job; poll /checklist/jobs/{job_id} for its status."""
     validated_data = body.model_dump()
     logger.info(f"Validated ChecklistRequest: {validated_data}")
-    return await ChecklistProcessor.process_checklist_in_parallel(**validated_data)
+    job = await JobEngine.submit(CHECKLIST_JOB, request_id=body.request_id, payload=validated_data)
+    return {"jobId": job["job_id"], "requestId": job["request_id"], "status": job["status"]}
+
+@router.get("/jobs")
+async def list_checklist_jobs(request_id: Optional[str] = None, status: Optional[str] = None, limit: int = 100):
+    return await JobEngine.list(status=status, request_id=request_id, limit=limit)
+
+@router.get("/jobs/{job_id}")
+async def get_checklist_job(job_id: str):
+    """Status, latest progress and (once finished) result or error of a checklist job."""
+    job = await JobEngine.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_checklist_job(job_id: str):
+    job = await JobEngine.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+_NO_ANSWER_INDEX = (
+    "No answer index for request {request_id}; range reads need a run with "
+    "processing_config.stream_answers enabled"
+)
+
+@router.get("/answers/{request_id}/blocks/{block_id}")
+async def get_checklist_answer(request_id: str, block_id: str):
+    """Serve one answered checklist leaf via a range read of the NDJSON answer blob."""
+    try:
+        answer = await ChecklistProcessor.get_answer(request_id, block_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=_NO_ANSWER_INDEX.format(request_id=request_id))
+    if answer is None:
+        raise HTTPException(status_code=404, detail=f"Block {block_id} has no answer")
+    return answer
+
+@router.get("/answers/{request_id}/sections/{section_id}")
+async def get_checklist_section_answers(request_id: str, section_id: str):
+    """Serve every answered leaf below a section via range reads of the NDJSON answer blob."""
+    try:
+        answers = await ChecklistProcessor.get_section_answers(request_id, section_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=_NO_ANSWER_INDEX.format(request_id=request_id))
+    if answers is None:
+        raise HTTPException(status_code=404, detail=f"Section {section_id} not found")
+    return {"sectionId": section_id, "blocks": answers}
 
 @router.post("/answer-checklist")
 async def answer_checklist(body: ChecklistRequest):
@@ -0,0 +1,199 @@
+"""
+Local stand-in for the Azure OpenAI Batch API (files + batches), so the
+checklist batch mode can be exercised end to end without Azure.
+
+Run it with `uvicorn batch_stand_in:app --port 8765` and point
+processing_config.batch_chat_model_config.endpoint at http://127.0.0.1:8765.
+Every request is answered with a schema-valid placeholder built from its
+structured-output JSON schema (first enum option, placeholder strings).
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+from typing import Any, Dict, Optional
+from fastapi import Body, FastAPI, File, Form, HTTPException, UploadFile
+from fastapi.responses import Response
+
+# Seconds spent per request, to make polling observable.
+REQUEST_DELAY_SECONDS = float(os.getenv("BATCH_STAND_IN_DELAY", "0"))
+
+app = FastAPI(title="Azure OpenAI Batch stand-in")
+
+_files: Dict[str, Dict[str, Any]] = {}
+_batches: Dict[str, Dict[str, Any]] = {}
+
+
+def _fill(schema: Dict[str, Any], root: Dict[str, Any]) -> Any:
+    """Smallest value valid for a structured-output JSON schema."""
+    if "$ref" in schema:
+        node = root
+        for part in schema["$ref"].lstrip("#/").split("/"):
+            node = node[part]
+        return _fill(node, root)
+    if "anyOf" in schema:
+        options = [s for s in schema["anyOf"] if s.get("type") != "null"] or schema["anyOf"]
+        return _fill(options[0], root)
+    if "enum" in schema:
+        return schema["enum"][0]
+    kind = schema.get("type")
+    if kind == "object":
+        return {name: _fill(prop, root) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return []
+    if kind == "string":
+        return "Stand-in answer."
+    if kind == "number":
+        return 1.0
+    if kind == "integer":
+        return 0
+    if kind == "boolean":
+        return True
+    return None
+
+
+def _answer(request: Dict[str, Any]) -> Dict[str, Any]:
+    body = request.get("body") or {}
+    response_format = body.get("response_format") or {}
+    schema = (response_format.get("json_schema") or {}).get("schema")
+    content = json.dumps(_fill(schema, schema)) if schema else "Stand-in answer."
+    prompt_tokens = sum(len(str(m.get("content") or "")) // 4 for m in body.get("messages", []))
+    completion_tokens = len(content) // 4
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model"),
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content, "refusal": None},
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def _store_file(content: bytes, filename: str, purpose: str) -> Dict[str, Any]:
+    file_id = f"file-{uuid.uuid4().hex}"
+    _files[file_id] = {
+        "meta": {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        },
+        "content": content,
+    }
+    return _files[file_id]["meta"]
+
+
+async def _run_batch(batch_id: str):
+    batch = _batches[batch_id]
+    lines = _files[batch["input_file_id"]]["content"].decode("utf-8").splitlines()
+    requests = [json.loads(line) for line in lines if line.strip()]
+    batch.update(status="in_progress", in_progress_at=int(time.time()))
+    batch["request_counts"]["total"] = len(requests)
+
+    output, errors = [], []
+    for request in requests:
+        if batch["status"] == "cancelling":
+            break
+        if REQUEST_DELAY_SECONDS:
+            await asyncio.sleep(REQUEST_DELAY_SECONDS)
+        record = {"id": f"batch_req_{uuid.uuid4().hex}", "custom_id": request.get("custom_id")}
+        try:
+            record.update(response={"status_code": 200, "request_id": uuid.uuid4().hex, "body": _answer(request)}, error=None)
+            output.append(record)
+            batch["request_counts"]["completed"] += 1
+        except Exception as e:
+            record.update(response=None, error={"code": "stand_in_error", "message": str(e)})
+            errors.append(record)
+            batch["request_counts"]["failed"] += 1
+
+    def to_jsonl(records) -> bytes:
+        return "".join(json.dumps(r) + "\n" for r in records).encode("utf-8")
+
+    if output:
+        batch["output_file_id"] = _store_file(to_jsonl(output), f"{batch_id}_output.jsonl", "batch_output")["id"]
+    if errors:
+        batch["error_file_id"] = _store_file(to_jsonl(errors), f"{batch_id}_error.jsonl", "batch_output")["id"]
+    now = int(time.time())
+    if batch["status"] == "cancelling":
+        batch.update(status="cancelled", cancelled_at=now)
+    else:
+        batch.update(status="completed", completed_at=now)
+
+
+@app.post("/openai/files")
+async def upload_file(file: UploadFile = File(...), purpose: str = Form(...)):
+    return _store_file(await file.read(), file.filename or "batch.jsonl", purpose)
+
+
+@app.get("/openai/files/{file_id}")
+async def get_file(file_id: str):
+    if file_id not in _files:
+        raise HTTPException(status_code=404, detail="File not found")
+    return _files[file_id]["meta"]
+
+
+@app.get("/openai/files/{file_id}/content")
+async def get_file_content(file_id: str):
+    if file_id not in _files:
+        raise HTTPException(status_code=404, detail="File not found")
+    return Response(content=_files[file_id]["content"], media_type="application/jsonl")
+
+
+@app.post("/openai/batches")
+async def create_batch(payload: Dict[str, Any] = Body(...)):
+    input_file_id = payload.get("input_file_id")
+    if input_file_id not in _files:
+        raise HTTPException(status_code=400, detail=f"Unknown input_file_id {input_file_id}")
+    batch_id = f"batch_{uuid.uuid4().hex}"
+    _batches[batch_id] = {
+        "id": batch_id,
+        "object": "batch",
+        "endpoint": payload.get("endpoint"),
+        "input_file_id": input_file_id,
+        "completion_window": payload.get("completion_window", "24h"),
+        "status": "validating",
+        "output_file_id": None,
+        "error_file_id": None,
+        "created_at": int(time.time()),
+        "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        "metadata": payload.get("metadata"),
+    }
+    asyncio.create_task(_run_batch(batch_id))
+    return _batches[batch_id]
+
+
+@app.get("/openai/batches/{batch_id}")
+async def get_batch(batch_id: str):
+    batch: Optional[Dict[str, Any]] = _batches.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch
+
+
+@app.post("/openai/batches/{batch_id}/cancel")
+async def cancel_batch(batch_id: str):
+    batch = _batches.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    if batch["status"] in ("validating", "in_progress"):
+        batch["status"] = "cancelling"
+    return batch
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=int(os.getenv("BATCH_STAND_IN_PORT", "8765")))
@@ -0,0 +1,132 @@
+"""
+Benchmark checklist template compilation against the compiled-template cache.
+
+Generates a synthetic template (default 50k blocks), then times a cold
+compile (json.loads + ChecklistTree + leaf grouping) against cache hits
+served from disk and from memory, and compares peak memory of the compact
+tree with the Block-object tree.
+
+Usage (from MAF-POC-MCP):
+    python -m benchmarks.template_compile_benchmark --blocks 50000
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from common_server.cache.template_cache import CompiledTemplateCache
+from models.data_class import ChecklistTree
+from tools.checklist_process import ChecklistProcessor, parse_block
+
+GUIDANCE = [
+    "IAS 1 (para 54 (a)), IAS 16 (para 73)",
+    "IFRS 7 (para 31), IFRS 13 (para 93 (b) (ii))",
+    "IAS 24 (para 18), IAS 1 (para 112 (c))",
+    "IFRS 15 (para 113 (a)), IFRS 15 (para 114)",
+    "",
+]
+
+
+def build_template(total_blocks: int, questions_per_section: int = 25, seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    sections = []
+    produced = 0
+    section_idx = 0
+    while produced < total_blocks:
+        questions = []
+        for q in range(min(questions_per_section, total_blocks - produced - 1)):
+            questions.append({
+                "blockId": f"s{section_idx}-q{q}",
+                "blockType": "RadioQuestion",
+                "title": f"Has the entity disclosed item {section_idx}.{q} in accordance with the framework?",
+                "responseOptions": ["Yes", "No", "N/A"],
+                "guidanceText": rng.choice(GUIDANCE),
+                "isAIResponseExpected": True,
+                "blocks": [],
+            })
+        sections.append({
+            "blockId": f"s{section_idx}",
+            "blockType": "Section",
+            "title": f"Section {section_idx}",
+            "blocks": questions,
+        })
+        produced += len(questions) + 1
+        section_idx += 1
+    return {
+        "metaData": {"checklistId": "bench", "totalBlocks": str(produced)},
+        "blocks": [{"blockId": "root", "blockType": "Section", "title": "Root", "blocks": sections}],
+    }
+
+
+def timed(fn, repeat: int):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def traced_peak(fn) -> int:
+    tracemalloc.start()
+    try:
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak
+
+
+def block_tree_groups(blocks, max_group_size):
+    # The former Block-object path: per-node ancestor tuples, per-group ancestor copies.
+    return [g.to_wire() for b in blocks for g in parse_block(b).walk_leaf_groups(max_group_size=max_group_size)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, default=50_000)
+    parser.add_argument("--max-group-size", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    raw = json.dumps(build_template(args.blocks)).encode("utf-8")
+    cache_dir = tempfile.mkdtemp(prefix="template-cache-bench-")
+    try:
+        cold, compiled = timed(
+            lambda: ChecklistProcessor.compile_checklist_template(json.loads(raw), max_group_size=args.max_group_size),
+            args.repeat,
+        )
+        key = CompiledTemplateCache.make_key("bench", len(raw), args.max_group_size)
+        cache = CompiledTemplateCache(cache_dir)
+        cache.put(key, compiled)
+        artifact_bytes = os.path.getsize(os.path.join(cache_dir, f"{key}.pkl"))
+
+        warm_memory, _ = timed(lambda: cache.get(key), args.repeat)
+        disk_cache = CompiledTemplateCache(cache_dir, max_memory_entries=0)
+        warm_disk, _ = timed(lambda: disk_cache.get(key), args.repeat)
+
+        blocks = json.loads(raw)["blocks"]
+        block_peak = traced_peak(lambda: block_tree_groups(blocks, args.max_group_size))
+        tree_peak = traced_peak(lambda: ChecklistTree.from_blocks(blocks).to_wire_groups(args.max_group_size))
+
+        _, groups = compiled
+        leaves = sum(len(g["leaves"]) for g in groups)
+        print(f"template: {args.blocks} blocks, {len(raw) / 1e6:.1f} MB, {len(groups)} groups, {leaves} leaves")
+        print(f"artifact: {artifact_bytes / 1e6:.1f} MB")
+        print(f"peak memory, Block tree + wire groups    : {block_peak / 1e6:8.1f} MB")
+        print(f"peak memory, ChecklistTree + wire groups : {tree_peak / 1e6:8.1f} MB")
+        print(f"cold compile      : {cold * 1000:8.1f} ms")
+        print(f"cache hit (disk)  : {warm_disk * 1000:8.1f} ms  ({cold / warm_disk:.1f}x)")
+        print(f"cache hit (memory): {warm_memory * 1000:8.1f} ms  ({cold / warm_memory:.1f}x)")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
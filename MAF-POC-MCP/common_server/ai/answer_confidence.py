@@ -0,0 +1,40 @@
+# answer_confidence.py
+import re
+import math
+from bisect import bisect_right
+from typing import Any, List, Optional, Sequence
+
+# JSON value of every "answer" field in a structured-output completion.
+_ANSWER_VALUE = re.compile(r'"answer"\s*:\s*("(?:[^"\\]|\\.)*"|null)')
+
+
+def answer_confidences(token_logprobs: Optional[Sequence[Any]]) -> List[float]:
+    """
+    Probability the model assigned to each `"answer"` value of a structured
+    completion, in output order: exp of the summed logprobs of the tokens
+    spelling the value. For an enum answer this is the probability of the
+    chosen option given everything generated before it.
+
+    `token_logprobs` is `choice.logprobs.content` (objects with `token` and
+    `logprob`); returns [] when logprobs were not returned.
+    """
+    tokens = list(token_logprobs or [])
+    if not tokens:
+        return []
+
+    starts, offset = [], 0
+    for token in tokens:
+        starts.append(offset)
+        offset += len(token.token)
+    text = "".join(token.token for token in tokens)
+
+    confidences = []
+    for match in _ANSWER_VALUE.finditer(text):
+        start, end = match.span(1)
+        i = bisect_right(starts, start) - 1
+        total = 0.0
+        while i < len(tokens) and starts[i] < end:
+            total += tokens[i].logprob
+            i += 1
+        confidences.append(math.exp(total))
+    return confidences
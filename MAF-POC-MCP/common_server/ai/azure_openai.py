@@ -1,5 +1,6 @@
-from openai import AzureOpenAI
-from typing import List, Dict
+from openai import AzureOpenAI, AsyncAzureOpenAI
+from typing import List, Dict, Tuple
+from common_server.ai.rate_limiter import AzureOpenAIRateLimiter, Priority, estimate_message_tokens
 
 class AzureOpenAIChat:
     ...
@@ -33,4 +34,95 @@ class AzureOpenAIChat:
             messages=messages,
             response_format=kwargs.get("response_format")
         )
-        return response.choices[0].message.parsed
\ No newline at end of file
+        return response.choices[0].message.parsed
+
+
+class AsyncAzureOpenAIChat:
+    """
+    Async structured-output chat client.
+
+    The underlying AsyncAzureOpenAI client (and therefore its HTTP connection
+    pool) is shared process-wide per endpoint/deployment/api_version/key, so
+    concurrent callers overlap their network waits instead of each opening
+    new connections. Calls go through the process-wide AzureOpenAIRateLimiter,
+    which owns retries (the SDK's own retries are disabled).
+    """
+    _clients: Dict[Tuple[str, str, str, str], AsyncAzureOpenAI] = {}
+    # Completion tokens reserved per call when the caller gives no max_tokens.
+    COMPLETION_TOKEN_ESTIMATE = 512
+
+    def __init__(self, api_key: str, endpoint: str, deployment_name: str, api_version: str):
+        """
+        Initialize (or reuse) the pooled Azure OpenAI chat client.
+        :param api_key: API key for authentication
+        :param endpoint: Azure OpenAI endpoint URL
+        :param deployment_name: Deployment name of the chat model
+        :param api_version: Azure OpenAI API version
+        """
+        self.endpoint = endpoint
+        self.deployment_name = deployment_name
+        self.client = self.get_client(
+            api_key=api_key,
+            endpoint=endpoint,
+            deployment_name=deployment_name,
+            api_version=api_version,
+        )
+
+    @classmethod
+    def get_client(cls, api_key: str, endpoint: str, deployment_name: str, api_version: str) -> AsyncAzureOpenAI:
+        key = (endpoint, deployment_name, api_version, api_key)
+        client = cls._clients.get(key)
+        if client is None:
+            client = AsyncAzureOpenAI(
+                api_key=api_key,
+                azure_deployment=deployment_name,
+                azure_endpoint=endpoint,
+                api_version=api_version,
+                max_retries=0,
+            )
+            cls._clients[key] = client
+        return client
+
+    async def ainvoke_chat_completion(self, messages: List[Dict[str, str]], **kwargs):
+        """
+        Invoke the chat model and return the whole parsed completion (choices,
+        usage and, with `logprobs=True`, the token logprobs of the answer).
+        :param messages: List of message dictionaries with 'role' and 'content'
+        :param logprobs: Request token logprobs for the generated content
+        :param priority: Rate-limiter priority class (default Priority.BATCH)
+        :return: ParsedChatCompletion from the chat model
+        """
+        estimated_tokens = estimate_message_tokens(messages) + (
+            kwargs.get("max_tokens") or self.COMPLETION_TOKEN_ESTIMATE
+        )
+        extra = {"logprobs": True} if kwargs.get("logprobs") else {}
+        return await AzureOpenAIRateLimiter.call(
+            self.endpoint,
+            self.deployment_name,
+            lambda: self.client.chat.completions.parse(
+                model=kwargs.get("model"),
+                messages=messages,
+                response_format=kwargs.get("response_format"),
+                **extra
+            ),
+            estimated_tokens=estimated_tokens,
+            priority=kwargs.get("priority", Priority.BATCH),
+        )
+
+    async def ainvoke_chat(self, messages: List[Dict[str, str]], **kwargs) -> Dict:
+        """
+        Invoke the chat model with the provided messages without blocking the event loop.
+        :param messages: List of message dictionaries with 'role' and 'content'
+        :param priority: Rate-limiter priority class (default Priority.BATCH)
+        :return: Parsed structured response from the chat model
+        """
+        response = await self.ainvoke_chat_completion(messages, **kwargs)
+        return response.choices[0].message.parsed
+
+    @classmethod
+    async def aclose_all(cls):
+        """Close every pooled client (call at shutdown)."""
+        clients = list(cls._clients.values())
+        cls._clients.clear()
+        for client in clients:
+            await client.close()
@@ -0,0 +1,144 @@
+# batch_client.py
+import os
+import json
+import time
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from openai import APIConnectionError, InternalServerError, RateLimitError, pydantic_function_tool
+from common_server.ai.azure_openai import AsyncAzureOpenAIChat
+from common_server.ai.rate_limiter import retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+
+class AzureOpenAIBatchClient:
+    """
+    Thin wrapper over the Azure OpenAI Batch API for structured-output chat
+    requests: write JSONL request lines, upload and submit the file, poll
+    the batch and stream its output back line by line.
+
+    Batch deployments have their own (much larger) enqueued-token quota, so
+    these calls bypass the live AzureOpenAIRateLimiter; each one is instead
+    retried on 429, connection and 5xx errors with exponential backoff. The
+    endpoint may point at the local stand-in (batch_stand_in.py) to run
+    offline.
+    """
+    TERMINAL_STATUSES = frozenset(("completed", "failed", "expired", "cancelled"))
+    COMPLETION_WINDOW = "24h"
+    MAX_ATTEMPTS = 6
+
+    def __init__(self, api_key: str, endpoint: str, deployment_name: str, api_version: str):
+        self.deployment_name = deployment_name
+        self.client = AsyncAzureOpenAIChat.get_client(
+            api_key=api_key,
+            endpoint=endpoint,
+            deployment_name=deployment_name,
+            api_version=api_version,
+        )
+
+    async def _call(self, request: Callable[[], Awaitable[Any]], what: str) -> Any:
+        """Run one Batch/Files API request, retrying transient failures."""
+        for attempt in range(1, self.MAX_ATTEMPTS + 1):
+            try:
+                return await request()
+            except (RateLimitError, APIConnectionError, InternalServerError) as e:
+                if attempt == self.MAX_ATTEMPTS:
+                    raise
+                backoff = retry_after_seconds(e) or min(60.0, 2 ** attempt)
+                logger.warning(f"{what} failed ({e}); retrying in {backoff:.0f}s")
+                await asyncio.sleep(backoff)
+
+    @staticmethod
+    def response_format_param(response_format) -> Dict[str, Any]:
+        """The strict json_schema response_format a live parse() call sends for `response_format`."""
+        # pydantic_function_tool is the SDK's public route to the same strict schema.
+        function = pydantic_function_tool(response_format)["function"]
+        return {
+            "type": "json_schema",
+            "json_schema": {"name": function["name"], "schema": function["parameters"], "strict": True},
+        }
+
+    def request_line(self, custom_id: str, messages: List[Dict[str, str]], response_format) -> str:
+        """One JSONL line of the batch input file (same body as a live parse() call)."""
+        return json.dumps(
+            {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/chat/completions",
+                "body": {
+                    "model": self.deployment_name,
+                    "messages": messages,
+                    "response_format": self.response_format_param(response_format),
+                },
+            },
+            ensure_ascii=False,
+        ) + "\n"
+
+    async def submit(self, path: str):
+        """Upload the JSONL input file and create the batch."""
+        async def upload():
+            with open(path, "rb") as f:
+                return await self.client.files.create(file=(os.path.basename(path), f), purpose="batch")
+
+        input_file = await self._call(upload, f"Uploading {path}")
+        batch = await self._call(
+            lambda: self.client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/chat/completions",  # Azure's path, without OpenAI's /v1 prefix
+                completion_window=self.COMPLETION_WINDOW,
+            ),
+            f"Creating batch for {input_file.id}",
+        )
+        logger.info(f"Submitted batch {batch.id} ({os.path.getsize(path)} bytes) to {self.deployment_name}")
+        return batch
+
+    async def retrieve(self, batch_id: str):
+        return await self._call(lambda: self.client.batches.retrieve(batch_id), f"Polling batch {batch_id}")
+
+    async def wait(self, batch_id: str, poll_seconds: float = 30.0, timeout_seconds: Optional[float] = None):
+        """
+        Poll until the batch reaches a terminal status. Past `timeout_seconds`
+        the batch is cancelled; results finished until then are still returned.
+        """
+        deadline = time.monotonic() + timeout_seconds if timeout_seconds else None
+        cancelled = False
+        while True:
+            batch = await self.retrieve(batch_id)
+            if batch.status in self.TERMINAL_STATUSES:
+                logger.info(f"Batch {batch_id} finished with status {batch.status}: {batch.request_counts}")
+                return batch
+            logger.info(f"Batch {batch_id} is {batch.status}: {batch.request_counts}")
+            if deadline is not None and not cancelled and time.monotonic() > deadline:
+                logger.warning(f"Batch {batch_id} exceeded {timeout_seconds:.0f}s, cancelling")
+                await self._call(lambda: self.client.batches.cancel(batch_id), f"Cancelling batch {batch_id}")
+                cancelled = True
+            await asyncio.sleep(poll_seconds)
+
+    async def _lines(self, file_id: str) -> AsyncIterator[Dict[str, Any]]:
+        async with self.client.files.with_streaming_response.content(file_id) as response:
+            async for line in response.iter_lines():
+                if line.strip():
+                    yield json.loads(line)
+
+    async def results(self, batch) -> AsyncIterator[Tuple[str, Optional[Dict[str, Any]], Optional[str]]]:
+        """Yield (custom_id, response body, error) for every output and error line of a batch."""
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            async for record in self._lines(file_id):
+                response = record.get("response") or {}
+                error = record.get("error")
+                if response.get("status_code") == 200 and not error:
+                    yield record.get("custom_id"), response.get("body"), None
+                else:
+                    detail = error or (response.get("body") or {}).get("error") or f"HTTP {response.get('status_code')}"
+                    yield record.get("custom_id"), None, str(detail)
+
+    @staticmethod
+    def parse_body(body: Dict[str, Any], response_format):
+        """Validate the structured answer of a chat completion response body."""
+        message = body["choices"][0]["message"]
+        if message.get("refusal"):
+            raise ValueError(f"Model refused: {message['refusal']}")
+        return response_format.model_validate_json(message.get("content") or "")
@@ -0,0 +1,54 @@
+# prompt_layout.py
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class PromptLayout:
+    """
+    Assembles chat messages so that every call of a run starts with the same
+    bytes, which is what Azure OpenAI prompt caching matches on (1024+ token
+    prefixes, extended in 128-token steps).
+
+    Order, from most to least shared:
+      1. system prompt + guard text      (identical for the whole run)
+      2. user prompt                     (identical for the whole run)
+      3. shared evidence                 (identical for items/groups retrieving the same chunks)
+      4. per-item content                (question titles, options)
+
+    The static prefix is built once and copied into each call, so it cannot
+    drift through per-call formatting.
+    """
+
+    def __init__(self, system_prompt: str, user_prompt: str, guard: Optional[str] = None):
+        system = f"{system_prompt}\n\n{guard}" if guard else system_prompt
+        self.prefix: Tuple[Dict[str, str], ...] = (
+            {"role": "system", "content": system},
+            {"role": "user", "content": user_prompt},
+        )
+
+    def messages(self, item: str, shared: Optional[str] = None) -> List[Dict[str, str]]:
+        messages = [dict(message) for message in self.prefix]
+        if shared:
+            messages.append({"role": "user", "content": shared})
+        messages.append({"role": "user", "content": item})
+        return messages
+
+
+def _field(obj: Any, name: str) -> Any:
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+def prompt_cache_usage(usage: Any) -> Tuple[int, int, int]:
+    """
+    (prompt_tokens, cached prompt tokens, completion_tokens) from a
+    completion's `usage`, given as the SDK object or a raw response dict.
+    """
+    details = _field(usage, "prompt_tokens_details")
+    return (
+        _field(usage, "prompt_tokens") or 0,
+        _field(details, "cached_tokens") or 0,
+        _field(usage, "completion_tokens") or 0,
+    )
@@ -0,0 +1,288 @@
+# rate_limiter.py
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from openai import APIConnectionError, InternalServerError, RateLimitError
+from service.config_service import ConfigService
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Lower value is served first when callers compete for capacity."""
+    INTERACTIVE = 0  # retrieval / query embeddings a user is waiting on
+    BATCH = 1        # checklist answering
+    BULK = 2         # ingestion embeddings
+
+
+_encoder = None
+_encoder_loaded = False
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count via tiktoken (cl100k_base), or a length-based estimate when unavailable."""
+    global _encoder, _encoder_loaded
+    if not _encoder_loaded:
+        _encoder_loaded = True
+        try:
+            from tiktoken import get_encoding
+            _encoder = get_encoding("cl100k_base")
+        except Exception as e:
+            logger.warning(f"Token encoder unavailable, estimating token counts: {e}")
+    if not text:
+        return 0
+    if _encoder is not None:
+        return len(_encoder.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def estimate_message_tokens(messages: List[Dict[str, Any]]) -> int:
+    # ~4 tokens of framing per message plus the reply primer, as in OpenAI's counting guide.
+    return sum(estimate_tokens(str(m.get("content") or "")) + 4 for m in messages) + 3
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read Retry-After (or Azure's retry-after-ms) from an OpenAI API error."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+class _Bucket:
+    """Continuously refilling bucket; the level may go negative after usage corrections."""
+    __slots__ = ("capacity", "rate", "level", "updated")
+
+    def __init__(self, per_minute: float, now: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = float(per_minute)
+        self.updated = now
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        # Requests larger than the bucket only wait for a full bucket.
+        needed = min(amount, self.capacity) - self.level
+        return 0.0 if needed <= 0 else needed / self.rate
+
+
+class DeploymentRateLimiter:
+    """
+    Token + request buckets and an adaptive concurrency limit for one
+    Azure OpenAI deployment, shared by every caller in the process.
+
+    Callers reserve their estimated tokens up front and settle with the
+    actual usage afterwards. Waiters are served strictly by priority, then
+    arrival. A 429 halves the concurrency limit and pauses the deployment
+    for its Retry-After; successes grow the limit back additively (AIMD).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        tokens_per_minute: int,
+        requests_per_minute: int,
+        max_concurrency: int = 32,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self._clock = clock
+        self.tokens = _Bucket(tokens_per_minute, clock())
+        self.requests = _Bucket(requests_per_minute, clock())
+        self.max_concurrency = max(1, max_concurrency)
+        self.concurrency_limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._waiters: List[Tuple[int, int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.stats = {"granted": 0, "throttled": 0, "waited_seconds": 0.0}
+
+    def _delay(self, tokens: int, now: float) -> float:
+        if self.in_flight >= int(self.concurrency_limit):
+            return float("inf")  # woken by the next release
+        self.tokens.refill(now)
+        self.requests.refill(now)
+        return max(self.paused_until - now, self.tokens.wait_time(tokens), self.requests.wait_time(1))
+
+    def _grant(self, tokens: int):
+        self.tokens.level -= tokens
+        self.requests.level -= 1
+        self.in_flight += 1
+        self.stats["granted"] += 1
+
+    def _pump(self):
+        self._timer = None
+        now = self._clock()
+        while self._waiters:
+            priority, _, tokens, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            delay = self._delay(tokens, now)
+            if delay > 0:
+                if delay != float("inf"):
+                    self._timer = asyncio.get_running_loop().call_later(delay, self._pump)
+                return
+            heapq.heappop(self._waiters)
+            self._grant(tokens)
+            future.set_result(None)
+
+    async def acquire(self, tokens: int, priority: Priority = Priority.BATCH):
+        """Wait until `tokens` and one request fit the budgets and a concurrency slot is free."""
+        started = self._clock()
+        if not self._waiters and self._delay(tokens, started) <= 0:
+            self._grant(tokens)
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._seq), tokens, future))
+        if self._timer is None:
+            self._pump()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(tokens, used_tokens=0)  # granted just before cancellation
+            raise
+        self.stats["waited_seconds"] += self._clock() - started
+
+    def release(self, reserved_tokens: int, used_tokens: Optional[int] = None, throttled: bool = False,
+                retry_after: Optional[float] = None):
+        """Settle a reservation with actual usage and adapt concurrency to the outcome."""
+        self.in_flight = max(0, self.in_flight - 1)
+        if used_tokens is not None:
+            self.tokens.level += reserved_tokens - used_tokens
+        if throttled:
+            self.stats["throttled"] += 1
+            self.concurrency_limit = max(1.0, self.concurrency_limit / 2)
+            pause = retry_after if retry_after is not None else 1.0
+            self.paused_until = max(self.paused_until, self._clock() + pause)
+            logger.warning(
+                f"429 from {self.name}: pausing {pause:.1f}s, concurrency limit -> {int(self.concurrency_limit)}"
+            )
+        else:
+            self.concurrency_limit = min(
+                float(self.max_concurrency), self.concurrency_limit + 1.0 / self.concurrency_limit
+            )
+        if self._timer is not None:
+            self._timer.cancel()
+        self._pump()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "waited_seconds": round(self.stats["waited_seconds"], 3),
+            "in_flight": self.in_flight,
+            "concurrency_limit": int(self.concurrency_limit),
+            "queued": len(self._waiters),
+        }
+
+
+class AzureOpenAIRateLimiter:
+    """
+    Process-wide registry of DeploymentRateLimiter instances, keyed by
+    endpoint and deployment. Limits come from `configure` or from the
+    AOAI_TPM / AOAI_RPM / AOAI_MAX_CONCURRENCY settings (optionally suffixed
+    with the upper-cased deployment name, e.g. AOAI_TPM_GPT_4O).
+    """
+    _limiters: Dict[Tuple[str, str], DeploymentRateLimiter] = {}
+    MAX_ATTEMPTS = 6
+
+    @staticmethod
+    def _setting(name: str, deployment: str, default: int) -> int:
+        suffix = "".join(c if c.isalnum() else "_" for c in deployment).upper()
+        return int(ConfigService.get(f"{name}_{suffix}", ConfigService.get(name, default)))
+
+    @classmethod
+    def configure(cls, endpoint: str, deployment: str, tokens_per_minute: int, requests_per_minute: int,
+                  max_concurrency: int = 32) -> DeploymentRateLimiter:
+        limiter = DeploymentRateLimiter(
+            name=deployment,
+            tokens_per_minute=tokens_per_minute,
+            requests_per_minute=requests_per_minute,
+            max_concurrency=max_concurrency,
+        )
+        cls._limiters[(endpoint, deployment)] = limiter
+        return limiter
+
+    @classmethod
+    def get(cls, endpoint: str, deployment: str) -> DeploymentRateLimiter:
+        limiter = cls._limiters.get((endpoint, deployment))
+        if limiter is None:
+            limiter = cls.configure(
+                endpoint,
+                deployment,
+                tokens_per_minute=cls._setting("AOAI_TPM", deployment, 240_000),
+                requests_per_minute=cls._setting("AOAI_RPM", deployment, 1_440),
+                max_concurrency=cls._setting("AOAI_MAX_CONCURRENCY", deployment, 32),
+            )
+        return limiter
+
+    @classmethod
+    def share(cls, endpoint: str, deployment: str, parts: int) -> Dict[str, Any]:
+        """`configure` arguments for one of `parts` processes splitting this deployment's budgets."""
+        limiter = cls.get(endpoint, deployment)
+        parts = max(1, parts)
+        return {
+            "endpoint": endpoint,
+            "deployment": deployment,
+            "tokens_per_minute": max(1, int(limiter.tokens.capacity) // parts),
+            "requests_per_minute": max(1, int(limiter.requests.capacity) // parts),
+            "max_concurrency": max(1, limiter.max_concurrency // parts),
+        }
+
+    @classmethod
+    async def call(
+        cls,
+        endpoint: str,
+        deployment: str,
+        request: Callable[[], Awaitable[Any]],
+        estimated_tokens: int,
+        priority: Priority = Priority.BATCH,
+    ) -> Any:
+        """
+        Run `request` under the deployment's budgets, settling the reservation
+        from `response.usage.total_tokens`. 429s are retried after Retry-After;
+        connection and 5xx errors with exponential backoff.
+        """
+        limiter = cls.get(endpoint, deployment)
+        for attempt in range(1, cls.MAX_ATTEMPTS + 1):
+            await limiter.acquire(estimated_tokens, priority)
+            try:
+                response = await request()
+            except RateLimitError as e:
+                limiter.release(estimated_tokens, throttled=True, retry_after=retry_after_seconds(e))
+                if attempt == cls.MAX_ATTEMPTS:
+                    raise
+                continue
+            except (APIConnectionError, InternalServerError) as e:
+                limiter.release(estimated_tokens, used_tokens=0)
+                if attempt == cls.MAX_ATTEMPTS:
+                    raise
+                backoff = min(30.0, 2 ** attempt)
+                logger.warning(f"{deployment} request failed ({e}); retrying in {backoff:.0f}s")
+                await asyncio.sleep(backoff)
+                continue
+            except BaseException:
+                limiter.release(estimated_tokens)
+                raise
+            usage = getattr(response, "usage", None)
+            limiter.release(estimated_tokens, used_tokens=getattr(usage, "total_tokens", None))
+            return response
+
+    @classmethod
+    def stats(cls) -> Dict[str, Dict[str, Any]]:
+        return {f"{endpoint}|{deployment}": l.snapshot() for (endpoint, deployment), l in cls._limiters.items()}
@@ -0,0 +1,31 @@
+# answer_cache.py
+import json
+import hashlib
+from typing import Any, Union
+from common_server.cache.sqlite_lru import SqliteLRUCache
+
+
+class LLMAnswerCache(SqliteLRUCache):
+    """
+    Persistent, content-addressed cache for LLM answers backed by sqlite.
+
+    Keys are sha256 digests of everything that determines an answer (model,
+    prompts, question, options, evidence), so identical re-runs are served
+    from disk. Values are stored as JSON text; eviction is LRU by size
+    (see SqliteLRUCache).
+    """
+    NAME = "Answer cache"
+    TABLE = "answers"
+    VALUE_TYPE = "TEXT"
+    DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+    @staticmethod
+    def make_key(**parts: Any) -> str:
+        payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _encode(self, value: Any) -> str:
+        return json.dumps(value, ensure_ascii=False, default=str)
+
+    def _decode(self, data: Union[str, bytes]) -> Any:
+        return json.loads(data)
@@ -0,0 +1,47 @@
+# embedding_cache.py
+import asyncio
+import hashlib
+from array import array
+from typing import List, Optional
+from common_server.cache.sqlite_lru import SqliteLRUCache
+
+
+class EmbeddingCache(SqliteLRUCache):
+    """
+    Persistent, content-addressed cache of embedding vectors backed by sqlite.
+
+    Entries are keyed by (model, dimensions, sha256 of the text), so an
+    unchanged chunk is never embedded twice, whichever document or position
+    it comes from. Vectors are stored as packed float32 blobs (4 bytes per
+    dimension, a quarter of their JSON size); eviction is LRU by size (see
+    SqliteLRUCache).
+    """
+    NAME = "Embedding cache"
+    TABLE = "embeddings"
+    VALUE_TYPE = "BLOB"
+    DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+    @staticmethod
+    def make_key(model: str, dimensions: int, text: str) -> str:
+        return f"{model}|{dimensions}|{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    def _encode(self, value: List[float]) -> bytes:
+        return array("f", value).tobytes()
+
+    def _decode(self, data: bytes) -> List[float]:
+        return array("f", data).tolist()
+
+    def get_vectors(self, model: str, dimensions: int, texts: List[str]) -> List[Optional[List[float]]]:
+        """Cached vectors for `texts`, in order; None where missing."""
+        keys = [self.make_key(model, dimensions, text) for text in texts]
+        found = self.get_many(keys)
+        return [found.get(key) for key in keys]
+
+    def put_vectors(self, model: str, dimensions: int, texts: List[str], vectors: List[List[float]]):
+        self.put_many((self.make_key(model, dimensions, text), vector) for text, vector in zip(texts, vectors))
+
+    async def aget_vectors(self, model: str, dimensions: int, texts: List[str]) -> List[Optional[List[float]]]:
+        return await asyncio.to_thread(self.get_vectors, model, dimensions, texts)
+
+    async def aput_vectors(self, model: str, dimensions: int, texts: List[str], vectors: List[List[float]]):
+        await asyncio.to_thread(self.put_vectors, model, dimensions, texts, vectors)
@@ -0,0 +1,229 @@
+# retrieval_cache.py
+import math
+import time
+import array
+import asyncio
+import hashlib
+import logging
+import operator
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ("filter_expr", "vector", "norm", "results", "stored_at")
+
+    def __init__(self, filter_expr: str, vector: array.array, norm: float, results: List[Dict], stored_at: float):
+        self.filter_expr = filter_expr
+        self.vector = vector
+        self.norm = norm
+        self.results = results
+        self.stored_at = stored_at
+
+
+class SemanticRetrievalCache:
+    """
+    Per-request_id cache of vector search results.
+
+    Lookups first try an exact match on (filter, query vector) and then a
+    cosine-similarity match against the cached query vectors of the same
+    request, so near-duplicate checklist questions reuse one search; that
+    scan runs in a worker thread to keep the event loop free. Entries expire
+    after `ttl_seconds`, each request keeps at most `max_entries_per_request`
+    and the whole cache at most `max_entries` (both LRU), and `invalidate`
+    drops a request's entries when new chunks are indexed for it. Searches
+    already in flight at that point still answer their callers but are not
+    stored (each request has a generation counter bumped by `invalidate`).
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.97,
+        ttl_seconds: float = 900.0,
+        max_entries_per_request: int = 512,
+        max_entries: int = 4096,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries_per_request = max_entries_per_request
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: Dict[str, "OrderedDict[str, _Entry]"] = {}
+        # (request_id, key) of every entry across requests, least recently used first
+        self._recency: "OrderedDict[Tuple[str, str], None]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._generations: Dict[str, int] = {}
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _exact_key(filter_expr: str, vector: array.array) -> str:
+        digest = hashlib.sha256(vector.tobytes())
+        digest.update((filter_expr or "").encode("utf-8"))
+        return digest.hexdigest()
+
+    def _touch(self, request_id: str, key: str):
+        self._entries[request_id].move_to_end(key)
+        self._recency.move_to_end((request_id, key))
+
+    def _drop(self, request_id: str, key: str):
+        entries = self._entries.get(request_id)
+        if entries is not None:
+            entries.pop(key, None)
+            if not entries:
+                del self._entries[request_id]
+        self._recency.pop((request_id, key), None)
+
+    def _live_entries(self, request_id: str) -> "OrderedDict[str, _Entry]":
+        entries = self._entries.get(request_id)
+        if entries is None:
+            return OrderedDict()
+        if self.ttl_seconds:
+            cutoff = self._clock() - self.ttl_seconds
+            for key in [k for k, e in entries.items() if e.stored_at < cutoff]:
+                self._drop(request_id, key)
+        return self._entries.get(request_id, OrderedDict())
+
+    @staticmethod
+    def _best_match(
+        vector: array.array,
+        candidates: List[Tuple[str, array.array, float]],
+        threshold: float,
+    ) -> Optional[str]:
+        """Key of the most similar candidate at or above `threshold` (cosine), if any."""
+        norm = math.sqrt(sum(map(operator.mul, vector, vector)))
+        if norm == 0:
+            return None
+        best_key, best_score = None, threshold
+        for key, cached_vector, cached_norm in candidates:
+            score = sum(map(operator.mul, vector, cached_vector)) / (norm * cached_norm)
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    async def lookup(
+        self,
+        request_id: str,
+        filter_expr: str,
+        vector: List[float],
+        similarity_threshold: Optional[float] = None,
+    ) -> Optional[List[Dict]]:
+        packed = array.array("f", vector)
+        entries = self._live_entries(request_id)
+
+        key = self._exact_key(filter_expr, packed)
+        entry = entries.get(key)
+        if entry is not None:
+            self._touch(request_id, key)
+            self.exact_hits += 1
+            return entry.results
+
+        threshold = self.similarity_threshold if similarity_threshold is None else similarity_threshold
+        candidates = [
+            (cached_key, cached.vector, cached.norm)
+            for cached_key, cached in entries.items()
+            if cached.filter_expr == filter_expr and cached.norm > 0 and len(cached.vector) == len(packed)
+        ]
+        if threshold < 1.0 and candidates:
+            # Up to max_entries_per_request full-size dot products: too slow for the event loop.
+            best_key = await asyncio.to_thread(self._best_match, packed, candidates, threshold)
+            # The entry may have been evicted or invalidated while the scan ran.
+            entry = self._entries.get(request_id, {}).get(best_key) if best_key is not None else None
+            if entry is not None:
+                self._touch(request_id, best_key)
+                self.semantic_hits += 1
+                return entry.results
+
+        self.misses += 1
+        return None
+
+    def store(self, request_id: str, filter_expr: str, vector: List[float], results: List[Dict]):
+        packed = array.array("f", vector)
+        self._live_entries(request_id)
+        entries = self._entries.setdefault(request_id, OrderedDict())
+        key = self._exact_key(filter_expr, packed)
+        entries[key] = _Entry(
+            filter_expr=filter_expr,
+            vector=packed,
+            norm=math.sqrt(sum(map(operator.mul, packed, packed))),
+            results=results,
+            stored_at=self._clock(),
+        )
+        self._recency[(request_id, key)] = None
+        self._touch(request_id, key)
+        while len(entries) > self.max_entries_per_request:
+            self._drop(request_id, next(iter(entries)))
+        while len(self._recency) > self.max_entries:
+            self._drop(*next(iter(self._recency)))
+
+    async def get_or_search(
+        self,
+        request_id: str,
+        filter_expr: str,
+        vector: List[float],
+        search: Callable[[], Awaitable[List[Dict]]],
+        similarity_threshold: Optional[float] = None,
+    ) -> List[Dict]:
+        """
+        Return cached results or run `search` once; concurrent identical
+        queries share the in-flight search instead of issuing duplicates.
+        """
+        cached = await self.lookup(request_id, filter_expr, vector, similarity_threshold)
+        if cached is not None:
+            return cached
+
+        flight_key = (request_id, self._exact_key(filter_expr, array.array("f", vector)))
+        pending = self._inflight.get(flight_key)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The leading search was cancelled; run our own below.
+
+        generation = self._generations.get(request_id, 0)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[flight_key] = future
+        try:
+            results = await search()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else is waiting.
+            future.exception()
+            raise
+        finally:
+            if self._inflight.get(flight_key) is future:
+                del self._inflight[flight_key]
+        if self._generations.get(request_id, 0) == generation:
+            self.store(request_id, filter_expr, vector, results)
+        future.set_result(results)
+        return results
+
+    def invalidate(self, request_id: str):
+        """Drop every cached search for `request_id` (new chunks were indexed)."""
+        self._generations[request_id] = self._generations.get(request_id, 0) + 1
+        # Later callers must not join a search that started before the new chunks.
+        for flight_key in [k for k in self._inflight if k[0] == request_id]:
+            del self._inflight[flight_key]
+        entries = self._entries.pop(request_id, None)
+        if entries is not None:
+            for key in entries:
+                self._recency.pop((request_id, key), None)
+            logger.info(f"Invalidated retrieval cache for request_id={request_id}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "requests": len(self._entries),
+            "entries": len(self._recency),
+        }
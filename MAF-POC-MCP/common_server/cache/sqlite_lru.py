@@ -0,0 +1,146 @@
+# sqlite_lru.py
+import os
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+
+class SqliteLRUCache:
+    """
+    Persistent key/value cache in one sqlite table (WAL journal), evicted
+    least-recently-used once the stored values exceed `max_bytes`.
+
+    Subclasses set TABLE / VALUE_TYPE and implement `_encode` / `_decode`;
+    keys are opaque strings the subclass derives from its own key schema.
+    Instances are shared per (class, path) through `open`.
+    """
+    NAME = "Cache"
+    TABLE = "entries"
+    VALUE_TYPE = "BLOB"
+    DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+    # sqlite's default bound-parameter limit is 999; stay well below it.
+    _QUERY_CHUNK = 500
+    _instances: Dict[Tuple[type, str], "SqliteLRUCache"] = {}
+
+    def __init__(self, path: str, max_bytes: Optional[int] = None):
+        self.path = path
+        self.max_bytes = max_bytes or self.DEFAULT_MAX_BYTES
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.TABLE} ("
+            " key TEXT PRIMARY KEY,"
+            f" value {self.VALUE_TYPE} NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.TABLE}_last_access ON {self.TABLE}(last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.TABLE}").fetchone()[0]
+
+    @classmethod
+    def open(cls, path: str, max_bytes: Optional[int] = None):
+        """Return the process-wide cache instance of this class for `path`."""
+        cache = SqliteLRUCache._instances.get((cls, path))
+        if cache is None:
+            cache = cls(path=path, max_bytes=max_bytes)
+            SqliteLRUCache._instances[(cls, path)] = cache
+        return cache
+
+    def _encode(self, value: Any) -> Union[str, bytes]:
+        raise NotImplementedError
+
+    def _decode(self, data: Union[str, bytes]) -> Any:
+        raise NotImplementedError
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Decoded values of the cached `keys`; missing keys are absent from the result."""
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, Union[str, bytes]] = {}
+        with self._lock:
+            for start in range(0, len(keys), self._QUERY_CHUNK):
+                part = keys[start:start + self._QUERY_CHUNK]
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM {self.TABLE} WHERE key IN ({', '.join('?' * len(part))})", part
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    f"UPDATE {self.TABLE} SET last_access = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return {key: self._decode(data) for key, data in found.items()}
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: Iterable[Tuple[str, Any]]):
+        rows = []
+        for key, value in items:
+            data = self._encode(value)
+            rows.append((key, data, len(data) if isinstance(data, bytes) else len(data.encode("utf-8"))))
+        now = time.time()
+        with self._lock:
+            for key, data, size in rows:
+                previous = self._conn.execute(f"SELECT size FROM {self.TABLE} WHERE key = ?", (key,)).fetchone()
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO {self.TABLE} (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                    (key, data, size, now),
+                )
+                self._total_bytes += size - (previous[0] if previous else 0)
+                self.writes += 1
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def put(self, key: str, value: Any):
+        self.put_many([(key, value)])
+
+    def _evict(self):
+        # Trim to 90% of the budget so eviction is not triggered on every write.
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute(f"SELECT key, size FROM {self.TABLE} ORDER BY last_access ASC").fetchall()
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            self._conn.execute(f"DELETE FROM {self.TABLE} WHERE key = ?", (key,))
+            self._total_bytes -= size
+            self.evictions += 1
+        logger.info(f"{self.NAME} evicted down to {self._total_bytes} bytes ({self.evictions} evictions so far)")
+
+    async def aget(self, key: str) -> Optional[Any]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, value: Any):
+        await asyncio.to_thread(self.put, key, value)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "bytes": self._total_bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+        SqliteLRUCache._instances.pop((type(self), self.path), None)
@@ -0,0 +1,103 @@
+# template_cache.py
+import os
+import sys
+import pickle
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CompiledTemplateCache:
+    """
+    On-disk cache of compiled checklist templates.
+
+    Entries are keyed by the caller (typically blob name + ETag + compile
+    options) and stored as pickles written atomically, so a template is
+    parsed once per version. The most recent payloads are also kept in
+    memory as bytes; every `get` unpickles a fresh copy, so callers may
+    mutate what they receive.
+    """
+    # Bump when the compiled layout changes so stale artifacts are ignored.
+    FORMAT_VERSION = 1
+    _instances: Dict[str, "CompiledTemplateCache"] = {}
+
+    def __init__(self, directory: str, max_memory_entries: int = 4):
+        self.directory = directory
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def open(cls, directory: str) -> "CompiledTemplateCache":
+        """Return the process-wide cache instance for `directory`."""
+        cache = cls._instances.get(directory)
+        if cache is None:
+            cache = cls(directory)
+            cls._instances[directory] = cache
+        return cache
+
+    @classmethod
+    def make_key(cls, *parts: Any) -> str:
+        payload = "|".join(str(p) for p in (cls.FORMAT_VERSION, sys.version_info[:2], *parts))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def _remember(self, key: str, data: bytes):
+        with self._lock:
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            data = self._memory.get(key)
+        if data is None:
+            try:
+                with open(self._path(key), "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                self.misses += 1
+                return None
+            self._remember(key, data)
+        try:
+            value = pickle.loads(data)
+        except Exception as e:
+            logger.warning(f"Discarding unreadable compiled template {key}: {e}")
+            self.invalidate(key)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._remember(key, data)
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._memory.pop(key, None)
+        if os.path.exists(self._path(key)):
+            os.remove(self._path(key))
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "in_memory": len(self._memory)}
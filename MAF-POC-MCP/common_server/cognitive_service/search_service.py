@@ -1,9 +1,11 @@
 import uuid
+import asyncio
 import logging
 from datetime import datetime
 from typing import List, Optional
 
 from models.checklist_request import SearchConfig
+from common_server.cache.retrieval_cache import SemanticRetrievalCache
 
 from azure.core.credentials import AzureKeyCredential
 from azure.search.documents import SearchClient
@@ -25,16 +27,25 @@ from beartype import beartype
 logger = logging.getLogger("AzureSearch")
 
 
+def request_id_filter(request_id: str) -> str:
+    """OData filter matching one request's chunks; quotes in the id are doubled as OData requires."""
+    return "request_id eq '{}'".format(str(request_id).replace("'", "''"))
+
+
 class ChunkIndexer:
     """
     Handles indexing (storing) of text chunks into Azure AI Search.
     """
+    # text-embedding-3-large without shortening.
+    DEFAULT_EMBEDDING_DIM = 3072
 
-    def __init__(self, search_config: SearchConfig, embedding_dim: int = 3072, create_if_not_exists: bool = True):
+    def __init__(self, search_config: SearchConfig, embedding_dim: int = DEFAULT_EMBEDDING_DIM, create_if_not_exists: bool = True):
         self.index_name = search_config.index_name
         self.endpoint = search_config.endpoint
         self.credential = AzureKeyCredential(search_config.api_key)
         self.embedding_dim = embedding_dim
+        # Per-request_id cache in front of search_similar_docs.
+        self.retrieval_cache = SemanticRetrievalCache()
 
         self.index_client = SearchIndexClient(endpoint=self.endpoint, credential=self.credential)
 
@@ -53,8 +64,15 @@ class ChunkIndexer:
         Create the index if it does not exist.
         """
         try:
-            self.index_client.get_index(self.index_name)
-            
+            index = self.index_client.get_index(self.index_name)
+            field = next((f for f in index.fields if f.name == "embeddings"), None)
+            dimensions = getattr(field, "vector_search_dimensions", None)
+            if dimensions and dimensions != self.embedding_dim:
+                raise ValueError(
+                    f"Index '{self.index_name}' stores {dimensions}-dimensional vectors but embeddings are "
+                    f"configured for {self.embedding_dim}; use another index_name or matching embedding dimensions"
+                )
+
             logger.info(f"✅ Index '{self.index_name}' already exists.")
         except ResourceNotFoundError:
             logger.warning(f"⚠️ Index '{self.index_name}' not found. Creating a new one...")
@@ -103,6 +121,11 @@ class ChunkIndexer:
                 self.index_client.create_index(index)
                 logger.info(f"🎯 Index '{self.index_name}' created successfully.")
 
+    def close(self):
+        """Close the underlying search and index clients."""
+        self.client.close()
+        self.index_client.close()
+
     # @beartype
     async def index_chunks(self, chunks: List[dict], request_id: Optional[str] = None) -> dict:
         request_id = request_id or str(uuid.uuid4())
@@ -114,7 +137,7 @@ class ChunkIndexer:
                 chunk = chunk.dict()
 
             chunk_data = {
-                "id": str(uuid.uuid4()),
+                "id": chunk.get("id") or str(uuid.uuid4()),
                 "request_id": request_id,
                 "created_at": datetime.utcnow().isoformat(),
                 "source": chunk.get("source", "blob"),
@@ -125,8 +148,10 @@ class ChunkIndexer:
             }
             documents.append(chunk_data)
 
-        result = self.client.upload_documents(documents)
+        result = await asyncio.to_thread(self.client.upload_documents, documents)
         succeeded = sum(1 for r in result if getattr(r, "succeeded", False))
+        # Cached searches for this request no longer reflect the index.
+        self.retrieval_cache.invalidate(request_id)
 
         return {
             "status": "success" if succeeded == len(result) else "partial",
@@ -137,9 +162,44 @@ class ChunkIndexer:
         }
 
 
-    async def search_similar_docs(self, query_vector: List[float], rag_retrieval_config):
+    async def delete_chunks(self, chunk_ids: List[str], request_id: Optional[str] = None) -> int:
+        """Delete chunks by id, in batches of 1000; returns how many were deleted."""
+        def _delete():
+            deleted = 0
+            for start in range(0, len(chunk_ids), 1000):
+                result = self.client.delete_documents(
+                    documents=[{"id": chunk_id} for chunk_id in chunk_ids[start:start + 1000]]
+                )
+                deleted += sum(1 for r in result if getattr(r, "succeeded", False))
+            return deleted
+
+        deleted = await asyncio.to_thread(_delete)
+        if request_id is not None:
+            self.retrieval_cache.invalidate(request_id)
+        return deleted
+
+    async def list_chunk_ids(self, filter_expr: Optional[str]) -> List[str]:
+        """
+        Return the ids of every indexed chunk matching `filter_expr`
+        (e.g. all evidence chunks of one request).
+        """
+        def _list():
+            results = self.client.search(search_text="*", select=["id"], filter=filter_expr)
+            return [r["id"] for r in results]
+
+        return await asyncio.to_thread(_list)
+
+    async def search_similar_docs(
+        self,
+        query_vector: List[float],
+        rag_retrieval_config,
+        request_id: Optional[str] = None,
+        similarity_threshold: Optional[float] = None,
+    ):
         """
         Search for documents similar to the given embedding vector.
+        When `request_id` is given, results are served from (and stored in)
+        the per-request semantic retrieval cache.
         """
         from azure.search.documents.models import VectorizedQuery
 
@@ -149,10 +209,25 @@ class ChunkIndexer:
             fields="embeddings"  # must be a list
         )
 
-        results = self.client.search(
-            vector_queries=[vector_query],
-            select=["text"],
-            filter=rag_retrieval_config.filter
+        def _search():
+            results = self.client.search(
+                vector_queries=[vector_query],
+                select=["id", "text", "source", "page_number", "paragraph_number"],
+                filter=rag_retrieval_config.filter
+            )
+            return [r for r in results]
+
+        async def _search_async():
+            # SearchClient is synchronous; keep the HTTP round trip (and paging)
+            # off the event loop so concurrent retrievals actually overlap.
+            return await asyncio.to_thread(_search)
+
+        if request_id is None:
+            return await _search_async()
+        return await self.retrieval_cache.get_or_search(
+            request_id=request_id,
+            filter_expr=rag_retrieval_config.filter,
+            vector=query_vector,
+            search=_search_async,
+            similarity_threshold=similarity_threshold,
         )
-
-        return [r for r in results]
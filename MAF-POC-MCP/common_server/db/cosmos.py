@@ -43,6 +43,10 @@ class CosmosDBStorage:
         except Exception:
             self.container = self.database.get_container_client(self.container_name)
 
+    def close(self):
+        """Release the underlying HTTP pipeline."""
+        self.client.__exit__(None, None, None)
+
     # -----------------------------
     # Insert Methods
     # -----------------------------
@@ -5,6 +5,7 @@ from common_server.schemas.base import BaseDto
 
 class ChunkModel(BaseDto):
     
+    id: Optional[str] = Field(None, description="Deterministic chunk id; a random id is assigned when missing")
     request_id: UUID4 = Field(..., description="Request identifier associated with the chunk")
     created_at: str = Field(..., description="Timestamp when the chunk was created")
     text: str = Field(..., description="Text content of the chunk")
@@ -0,0 +1,45 @@
+from typing import AsyncIterable, AsyncIterator, Optional
+
+
+class AsyncChunkReader:
+    """
+    Async file-like adapter over an async iterable of byte chunks (e.g. a
+    blob download's `chunks()`), exposing the `read(size)` coroutine that
+    ijson's async parsers expect. Holds at most one chunk at a time.
+    """
+
+    def __init__(self, chunks: AsyncIterable[bytes]):
+        self._chunks: AsyncIterator[bytes] = chunks.__aiter__()
+        self._current: Optional[memoryview] = None
+        self._pos = 0
+        self.bytes_read = 0
+
+    async def _next_chunk(self) -> bool:
+        while True:
+            try:
+                chunk = await self._chunks.__anext__()
+            except StopAsyncIteration:
+                self._current = None
+                return False
+            if chunk:
+                self._current = memoryview(chunk)
+                self._pos = 0
+                return True
+
+    async def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            parts = []
+            while True:
+                part = await self.read(1 << 20)
+                if not part:
+                    return b"".join(parts)
+                parts.append(part)
+
+        if self._current is None or self._pos >= len(self._current):
+            if not await self._next_chunk():
+                return b""
+        end = min(self._pos + size, len(self._current))
+        data = self._current[self._pos:end].tobytes()
+        self._pos = end
+        self.bytes_read += len(data)
+        return data
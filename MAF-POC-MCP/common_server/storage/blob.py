@@ -1,8 +1,9 @@
 from azure.storage.blob.aio import BlobServiceClient
 import os
-from azure.core.exceptions import ResourceExistsError
-from azure.storage.blob import ContentSettings
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError
+from azure.storage.blob import BlobBlock, ContentSettings
 import mimetypes
+from typing import IO, AsyncIterator, List
 
 class AzureBlobStorageManager:
     """
@@ -41,13 +42,13 @@ class AzureBlobStorageManager:
         
         return blob_url
 
-    async def upload_blob_content(self, blob_name: str, content: bytes, content_type: str | None = None):
+    async def upload_blob_content(self, blob_name: str, content: bytes | IO[bytes], content_type: str | None = None):
         """
         Uploads a file to Azure Blob Storage.
 
         Args:
             blob_name (str): The name/path of the blob in the container.
-            content (bytes): The file content (in bytes).
+            content (bytes | IO[bytes]): The file content, or a binary file object to stream from.
             content_type (str | None): Optional MIME type (auto-detected if not given).
 
         Returns:
@@ -92,6 +93,28 @@ class AzureBlobStorageManager:
                 "error": str(e)
             }
 
+    async def stage_block(self, blob_name: str, block_id: str, data: bytes):
+        """
+        Stages one uncommitted block of a block blob.
+        :param blob_name: Name of the block blob
+        :param block_id: Base64 block id (all ids of a blob must have the same length)
+        :param data: Block content
+        """
+        blob_client = self.container_client.get_blob_client(blob_name)
+        await blob_client.stage_block(block_id=block_id, data=data)
+
+    async def commit_block_list(self, blob_name: str, block_ids: List[str], content_type: str | None = None):
+        """
+        Commits the given staged blocks, in order, as the content of a block blob.
+        Committing again with a longer list extends the visible content.
+        """
+        blob_client = self.container_client.get_blob_client(blob_name)
+        content_settings = ContentSettings(content_type=content_type) if content_type else None
+        await blob_client.commit_block_list(
+            [BlobBlock(block_id=block_id) for block_id in block_ids],
+            content_settings=content_settings,
+        )
+
     def download_file(self, blob_name: str, download_path: str = None) -> str:
         """
         Downloads a blob from Azure Blob Storage.
@@ -134,6 +157,43 @@ class AzureBlobStorageManager:
         stream = await blob_client.download_blob()
         return stream
     
+    async def stream_blob_chunks(self, blob_name: str) -> AsyncIterator[bytes]:
+        """
+        Yields the content of a blob chunk by chunk as it downloads.
+        :raises FileNotFoundError: If the blob does not exist
+        """
+        blob_client = self.container_client.get_blob_client(blob_name)
+        try:
+            stream = await blob_client.download_blob()
+        except ResourceNotFoundError:
+            raise FileNotFoundError(f"Blob '{blob_name}' does not exist in container '{self.container_name}'")
+        async for chunk in stream.chunks():
+            yield chunk
+
+    async def read_blob_range(self, blob_name: str, offset: int, length: int) -> bytes:
+        """
+        Reads `length` bytes starting at `offset` with a single ranged GET.
+        :raises FileNotFoundError: If the blob does not exist
+        """
+        blob_client = self.container_client.get_blob_client(blob_name)
+        try:
+            stream = await blob_client.download_blob(offset=offset, length=length)
+        except ResourceNotFoundError:
+            raise FileNotFoundError(f"Blob '{blob_name}' does not exist in container '{self.container_name}'")
+        return await stream.readall()
+
+    async def get_blob_etag(self, blob_name: str) -> str:
+        """
+        Returns the current ETag of a blob.
+        :raises FileNotFoundError: If the blob does not exist
+        """
+        blob_client = self.container_client.get_blob_client(blob_name)
+        try:
+            properties = await blob_client.get_blob_properties()
+        except ResourceNotFoundError:
+            raise FileNotFoundError(f"Blob '{blob_name}' does not exist in container '{self.container_name}'")
+        return properties.etag
+
     async def read_blob_bytes(self, blob_name: str) -> bytes:
         
         async with self.container_client.get_blob_client(blob_name) as blob_client:
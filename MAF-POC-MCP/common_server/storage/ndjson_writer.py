@@ -0,0 +1,82 @@
+import json
+import base64
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+from common_server.storage.blob import AzureBlobStorageManager
+
+logger = logging.getLogger(__name__)
+
+
+class BlobNdjsonWriter:
+    """
+    Streams JSON records to a block blob as NDJSON.
+
+    Records are buffered up to `block_bytes`, staged as one block and the
+    block list is committed right away, so readers see every flushed record
+    while the writer is still running and memory stays bounded by one block.
+    With `index_key`, the byte range of every record is tracked under
+    `record[index_key]` so single records can be range-read later.
+    """
+
+    def __init__(
+        self,
+        blob_manager: AzureBlobStorageManager,
+        blob_name: str,
+        block_bytes: int = 4 * 1024 * 1024,
+        index_key: Optional[str] = None,
+    ):
+        self.blob_manager = blob_manager
+        self.blob_name = blob_name
+        self.block_bytes = block_bytes
+        self.index_key = index_key
+        self.records = 0
+        self.offsets: Dict[str, Tuple[int, int]] = {}
+        self._committed_bytes = 0
+        self._buffer = bytearray()
+        self._block_ids: List[str] = []
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _block_id(index: int) -> str:
+        return base64.b64encode(f"{index:08d}".encode("ascii")).decode("ascii")
+
+    async def write(self, records: Iterable[Dict]):
+        async with self._lock:
+            for record in records:
+                line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+                if self.index_key and record.get(self.index_key) is not None:
+                    self.offsets[record[self.index_key]] = (self._committed_bytes + len(self._buffer), len(line))
+                self._buffer += line
+                self.records += 1
+            if len(self._buffer) >= self.block_bytes:
+                await self._flush()
+
+    async def _flush(self):
+        if not self._buffer:
+            return
+        block_id = self._block_id(len(self._block_ids))
+        await self.blob_manager.stage_block(self.blob_name, block_id, bytes(self._buffer))
+        self._block_ids.append(block_id)
+        self._committed_bytes += len(self._buffer)
+        self._buffer.clear()
+        await self.blob_manager.commit_block_list(
+            self.blob_name, self._block_ids, content_type="application/x-ndjson"
+        )
+
+    async def flush(self):
+        """Stage and commit whatever is buffered."""
+        async with self._lock:
+            await self._flush()
+
+    async def close(self):
+        await self.flush()
+        if not self._block_ids:
+            # Nothing was written; still publish an empty blob.
+            await self.blob_manager.upload_blob_content(
+                blob_name=self.blob_name, content=b"", content_type="application/x-ndjson"
+            )
+        logger.info(f"Committed {self.records} records in {len(self._block_ids)} blocks to {self.blob_name}")
+
+    def stats(self) -> Dict[str, int]:
+        return {"records": self.records, "blocks": len(self._block_ids)}
@@ -0,0 +1,238 @@
+# async_pipeline.py
+import asyncio
+import inspect
+import logging
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, Awaitable, Callable, Iterable, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+@dataclass
+class PipelineStage:
+    """
+    A single stage of an AsyncStagedPipeline.
+
+    `handler` receives one item and returns the item to forward to the next
+    stage (or None to drop it). `concurrency` workers pull from the stage's
+    bounded input queue, so a slow item only occupies one worker slot instead
+    of holding up a whole batch.
+
+    With `batch_size` > 1 the handler receives a list of up to `batch_size`
+    items instead, flushed early once `batch_timeout` seconds pass after the
+    first one arrives, so a trickling source still makes progress. With
+    `fan_out` the handler returns an iterable whose elements are forwarded
+    one by one (e.g. a batch handler returning its items).
+    """
+    name: str
+    handler: Callable[[Any], Awaitable[Any]]
+    concurrency: int = 1
+    queue_size: int = 100
+    batch_size: int = 1
+    batch_timeout: float = 1.0
+    fan_out: bool = False
+
+
+@dataclass
+class StageStats:
+    processed: int = 0
+    failed: int = 0
+    busy_seconds: float = 0.0
+    calls: int = 0
+    forwarded: int = 0
+    first_started: Optional[float] = None
+    last_finished: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        elapsed = (
+            self.last_finished - self.first_started
+            if self.first_started is not None and self.last_finished is not None
+            else 0.0
+        )
+        return {
+            "processed": self.processed,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "calls": self.calls,
+            "forwarded": self.forwarded,
+            "items_per_second": round(self.processed / elapsed, 2) if elapsed > 0 else None,
+        }
+
+
+@dataclass
+class PipelineStats:
+    stages: dict = field(default_factory=dict)
+    emitted: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "emitted": self.emitted,
+            "stages": {name: s.to_dict() for name, s in self.stages.items()},
+        }
+
+
+class AsyncStagedPipeline:
+    """
+    Pure-asyncio pipeline of stages connected by bounded queues.
+
+    Every stage runs its own pool of workers (rolling window, no batch
+    barriers) and back-pressure propagates upstream through the queue bounds,
+    so memory stays bounded however long the source is. Stages may batch
+    their input and fan out their output (see PipelineStage).
+    Items that fail in a stage are handed to `on_error`; whatever it returns
+    is sent straight to the sink so the failure is still reported.
+    """
+
+    def __init__(
+        self,
+        stages: List[PipelineStage],
+        sink: Optional[Callable[[Any], Union[Awaitable[None], None]]] = None,
+        on_error: Optional[Callable[[str, Any, BaseException], Any]] = None,
+    ):
+        if not stages:
+            raise ValueError("AsyncStagedPipeline requires at least one stage")
+        self.stages = stages
+        self.sink = sink
+        self.on_error = on_error
+        self.stats = PipelineStats(stages={s.name: StageStats() for s in stages})
+
+    async def _emit(self, item: Any):
+        self.stats.emitted += 1
+        if self.sink is None:
+            return
+        result = self.sink(item)
+        if inspect.isawaitable(result):
+            await result
+
+    async def _feed(self, source: Union[Iterable, AsyncIterable], queue: asyncio.Queue):
+        if hasattr(source, "__aiter__"):
+            async for item in source:
+                await queue.put(item)
+        else:
+            for item in source:
+                await queue.put(item)
+
+    @staticmethod
+    async def _next_batch(stage: PipelineStage, inbox: asyncio.Queue):
+        """
+        Up to `batch_size` items, waiting at most `batch_timeout` after the
+        first; returns (batch, stopped) where `stopped` means the stop marker
+        was reached.
+        """
+        item = await inbox.get()
+        if item is _STOP:
+            return [], True
+        batch = [item]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + stage.batch_timeout
+        while len(batch) < stage.batch_size:
+            remaining = deadline - loop.time()
+            try:
+                item = inbox.get_nowait() if remaining <= 0 else await asyncio.wait_for(inbox.get(), remaining)
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _worker(self, stage: PipelineStage, inbox: asyncio.Queue, outbox: asyncio.Queue):
+        stats = self.stats.stages[stage.name]
+        loop = asyncio.get_running_loop()
+        batched = stage.batch_size > 1
+        stopped = False
+        while not stopped:
+            if batched:
+                item, stopped = await self._next_batch(stage, inbox)
+                if not item:
+                    return
+                size = len(item)
+            else:
+                item = await inbox.get()
+                if item is _STOP:
+                    return
+                size = 1
+            started = loop.time()
+            if stats.first_started is None:
+                stats.first_started = started
+            try:
+                result = await stage.handler(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                stats.failed += size
+                logger.error(f"Pipeline stage '{stage.name}' failed: {e}", exc_info=True)
+                fallback = self.on_error(stage.name, item, e) if self.on_error else None
+                if fallback is not None:
+                    await self._emit(fallback)
+                continue
+            finally:
+                stats.last_finished = loop.time()
+                stats.busy_seconds += stats.last_finished - started
+            stats.calls += 1
+            stats.processed += size
+            if result is None:
+                continue
+            for forwarded in (result if stage.fan_out else (result,)):
+                stats.forwarded += 1
+                await outbox.put(forwarded)
+
+    async def _run_stage(self, stage: PipelineStage, inbox: asyncio.Queue, outbox: asyncio.Queue, downstream_workers: int):
+        workers = [
+            asyncio.create_task(self._worker(stage, inbox, outbox))
+            for _ in range(max(1, stage.concurrency))
+        ]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for w in workers:
+                w.cancel()
+        # One stop marker per downstream worker once this stage is drained.
+        for _ in range(downstream_workers):
+            await outbox.put(_STOP)
+
+    async def _drain(self, queue: asyncio.Queue):
+        while True:
+            item = await queue.get()
+            if item is _STOP:
+                return
+            await self._emit(item)
+
+    async def run(self, source: Union[Iterable, AsyncIterable]) -> PipelineStats:
+        """
+        Push every item of `source` through all stages and into the sink.
+        Returns per-stage statistics once the last item has been emitted.
+        """
+        queues = [asyncio.Queue(maxsize=max(1, s.queue_size)) for s in self.stages]
+        queues.append(asyncio.Queue(maxsize=max(1, self.stages[-1].queue_size)))
+        first_workers = max(1, self.stages[0].concurrency)
+
+        async def feed_first():
+            try:
+                await self._feed(source, queues[0])
+            finally:
+                for _ in range(first_workers):
+                    await queues[0].put(_STOP)
+
+        tasks = [asyncio.create_task(feed_first())]
+        for idx, stage in enumerate(self.stages):
+            downstream = (
+                max(1, self.stages[idx + 1].concurrency)
+                if idx + 1 < len(self.stages)
+                else 1
+            )
+            tasks.append(asyncio.create_task(
+                self._run_stage(stage, queues[idx], queues[idx + 1], downstream)
+            ))
+        tasks.append(asyncio.create_task(self._drain(queues[-1])))
+
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        return self.stats
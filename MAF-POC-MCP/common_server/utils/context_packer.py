@@ -0,0 +1,157 @@
+# context_packer.py
+import re
+import hashlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+from common_server.utils.text_chunker import TextChunker
+
+# Fields of a search hit that are worth showing to the model.
+_CONTEXT_FIELDS = ("source", "page_number", "paragraph_number")
+_WORD = re.compile(r"\S+")
+
+
+@dataclass
+class PackedContext:
+    """Evidence selected for one prompt, rendered as compact plain text."""
+    chunks: List[Dict] = field(default_factory=list)
+    text: str = ""
+    tokens: int = 0
+    dropped: int = 0
+
+
+class ContextPacker:
+    """
+    Packs retrieved search chunks into a per-question token budget.
+
+    Chunks are ordered by search score, `@search.*` metadata is stripped,
+    duplicates and chunks mostly contained in a better one are dropped, a
+    chunk's prefix repeating the tail of an already packed chunk (the
+    chunker's overlap window) is trimmed, and chunks are added until the
+    budget is spent. Each chunk keeps a stable id (the index key, or a
+    content hash) that the model can cite.
+    """
+    _chunkers: Dict[str, TextChunker] = {}
+
+    def __init__(
+        self,
+        max_tokens: int = 3000,
+        overlap_threshold: float = 0.8,
+        shingle_size: int = 5,
+        min_overlap_words: int = 8,
+        encoder_model: str = "text-embedding-3-large",
+    ):
+        self.max_tokens = max_tokens
+        self.overlap_threshold = overlap_threshold
+        self.shingle_size = shingle_size
+        self.min_overlap_words = min_overlap_words
+        chunker = self._chunkers.get(encoder_model)
+        if chunker is None:
+            chunker = self._chunkers[encoder_model] = TextChunker(model_name=encoder_model)
+        self.encoder = chunker.encoder
+
+    def count_tokens(self, text: str) -> int:
+        if self.encoder:
+            return len(self.encoder.encode(text, disallowed_special=()))
+        return len(text) // 4 + 1
+
+    @staticmethod
+    def chunk_id(chunk: Dict) -> str:
+        if chunk.get("id"):
+            return str(chunk["id"])
+        return hashlib.sha256(str(chunk.get("text", "")).encode("utf-8")).hexdigest()[:16]
+
+    def _shingles(self, words: List[str]) -> Set[Tuple[str, ...]]:
+        n = self.shingle_size
+        if len(words) < n:
+            return {tuple(words)} if words else set()
+        return {tuple(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+    def _trim_overlap(self, packed_words: List[List[str]], words: List[str]) -> List[str]:
+        """Drop a prefix of `words` that repeats the tail of an already packed chunk."""
+        best = 0
+        for previous in packed_words:
+            limit = min(len(previous), len(words) - 1)
+            for size in range(limit, self.min_overlap_words - 1, -1):
+                if size <= best:
+                    break
+                if previous[-size:] == words[:size]:
+                    best = size
+                    break
+        return words[best:] if best else words
+
+    def _fit(self, text: str, budget: int) -> Optional[str]:
+        """Truncate text to `budget` tokens (used when even the best chunk is too long)."""
+        if budget <= 0:
+            return None
+        if self.encoder:
+            return self.encoder.decode(self.encoder.encode(text, disallowed_special=())[:budget])
+        return text[: budget * 4]
+
+    @staticmethod
+    def _header(chunk_id: str, chunk: Dict) -> str:
+        details = []
+        if chunk.get("source"):
+            details.append(str(chunk["source"]))
+        if chunk.get("page_number") is not None:
+            details.append(f"page {chunk['page_number']}")
+        if chunk.get("paragraph_number") is not None:
+            details.append(f"para {chunk['paragraph_number']}")
+        return f"[{chunk_id}]" + (f" ({', '.join(details)})" if details else "")
+
+    def pack(self, results: List[Dict], max_tokens: Optional[int] = None) -> PackedContext:
+        budget = self.max_tokens if max_tokens is None else max_tokens
+        ranked = sorted(
+            enumerate(results or []),
+            key=lambda item: (-(item[1].get("@search.score") or 0.0), item[0]),
+        )
+
+        packed = PackedContext()
+        seen_ids: Set[str] = set()
+        packed_shingles: List[Set[Tuple[str, ...]]] = []
+        packed_words: List[List[str]] = []
+        sections: List[str] = []
+        remaining = budget
+
+        for _, hit in ranked:
+            text = str(hit.get("text") or "").strip()
+            chunk_id = self.chunk_id(hit)
+            words = _WORD.findall(text)
+            if not words or chunk_id in seen_ids:
+                packed.dropped += 1
+                continue
+
+            shingles = self._shingles([w.lower() for w in words])
+            if any(
+                len(shingles & other) >= self.overlap_threshold * len(shingles)
+                for other in packed_shingles
+            ):
+                packed.dropped += 1
+                continue
+
+            words = self._trim_overlap(packed_words, words)
+            body = " ".join(words)
+            chunk = {"id": chunk_id, **{k: hit[k] for k in _CONTEXT_FIELDS if hit.get(k) is not None}}
+            section = f"{self._header(chunk_id, chunk)}\n{body}"
+            cost = self.count_tokens(section) + 2  # blank-line separator
+            if cost > remaining:
+                if sections:
+                    packed.dropped += 1
+                    continue
+                section = self._fit(section, remaining)
+                if not section or "\n" not in section:
+                    packed.dropped += 1
+                    continue
+                body = section.split("\n", 1)[1]
+                cost = remaining
+
+            seen_ids.add(chunk_id)
+            packed_shingles.append(shingles)
+            packed_words.append(words)
+            chunk["text"] = body
+            packed.chunks.append(chunk)
+            sections.append(section)
+            remaining -= cost
+
+        packed.text = "\n\n".join(sections)
+        packed.tokens = budget - remaining
+        return packed
@@ -1,9 +1,10 @@
 # embedding_service.py
 import asyncio
 import logging
-from typing import List
-from openai import AsyncAzureOpenAI
-from tenacity import retry, stop_after_attempt, wait_exponential
+from typing import List, Optional, Tuple
+from openai import AsyncAzureOpenAI, BadRequestError
+from common_server.ai.rate_limiter import AzureOpenAIRateLimiter, Priority, estimate_tokens
+from service.config_service import ConfigService
 
 
 logger = logging.getLogger(__name__)
@@ -11,7 +12,9 @@ logger = logging.getLogger(__name__)
 class AzureEmbeddingService:
     """
     Service for generating embeddings using Azure OpenAI.
+    Requests are metered (and retried) by the shared AzureOpenAIRateLimiter.
     """
+    BATCH_RETRIES = 2
 
     def __init__(
         self,
@@ -19,7 +22,10 @@ class AzureEmbeddingService:
         endpoint: str,
         deployment_name: str,
         api_version: str = "2024-08-01-preview",
-        batch_size: int = 100
+        batch_size: int = 100,
+        max_batch_tokens: int = 100_000,
+        max_in_flight: Optional[int] = None,
+        dimensions: Optional[int] = None
     ):
         """
         Initialize the Azure embedding service.
@@ -30,35 +36,102 @@ class AzureEmbeddingService:
             deployment_name (str): Name of the deployed embedding model (e.g., "text-embedding-3-large").
             api_version (str): API version for Azure OpenAI.
             batch_size (int): Max number of text inputs per batch.
+            max_batch_tokens (int): Max total input tokens per batch request.
+            max_in_flight (int): Max concurrent batch requests of this service
+                (EMBEDDING_MAX_IN_FLIGHT setting, 8 by default).
+            dimensions (int): Output dimensions for models that support
+                shortening (text-embedding-3-*); the model default when None.
         """
         self.client = AsyncAzureOpenAI(
             api_key=api_key,
             azure_endpoint=endpoint,
             api_version=api_version,
+            max_retries=0,
         )
+        self.endpoint = endpoint
         self.deployment_name = deployment_name
         self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.dimensions = dimensions
+        self.max_in_flight = max_in_flight or int(ConfigService.get("EMBEDDING_MAX_IN_FLIGHT", 8))
+        # Shared by every create_embeddings call, so concurrent callers respect one limit.
+        self._in_flight = asyncio.Semaphore(max(1, self.max_in_flight))
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=2, min=1, max=10))
-    async def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+    def _make_batches(self, texts: List[str]) -> List[Tuple[List[str], int]]:
         """
-        Internal method to create embeddings for a batch of text with retry support.
+        Split texts into consecutive (batch, token count) pairs bounded by both
+        item count and total token count, so no single request exceeds the
+        token limit. Each input is tokenized exactly once.
         """
-        logger.info(f"Creating embeddings for batch of {len(batch)} texts...")
-        response = await self.client.embeddings.create(
-            model=self.deployment_name,
-            input=batch
+        batches, current, current_tokens = [], [], 0
+        for text in texts:
+            tokens = estimate_tokens(text)
+            if current and (
+                len(current) >= self.batch_size
+                or current_tokens + tokens > self.max_batch_tokens
+            ):
+                batches.append((current, current_tokens))
+                current, current_tokens = [], 0
+            current.append(text)
+            current_tokens += tokens
+        if current:
+            batches.append((current, current_tokens))
+        return batches
+
+    async def _create(self, texts: List[str], priority: Priority, estimated_tokens: Optional[int] = None):
+        if estimated_tokens is None:
+            estimated_tokens = sum(estimate_tokens(t) for t in texts)
+        extra = {"dimensions": self.dimensions} if self.dimensions else {}
+        return await AzureOpenAIRateLimiter.call(
+            self.endpoint,
+            self.deployment_name,
+            lambda: self.client.embeddings.create(model=self.deployment_name, input=texts, **extra),
+            estimated_tokens=estimated_tokens,
+            priority=priority,
         )
-        embeddings = [item.embedding for item in response.data]
+
+    async def _embed_batch(
+        self, batch: List[str], priority: Priority = Priority.BULK, estimated_tokens: Optional[int] = None
+    ) -> List[List[float]]:
+        """
+        Internal method to create embeddings for a batch of text; the rate
+        limiter retries 429s (after Retry-After) and transient errors.
+        """
+        logger.info(f"Creating embeddings for batch of {len(batch)} texts...")
+        response = await self._create(batch, priority, estimated_tokens)
+        # The API returns one entry per input with its index; don't rely on response order.
+        embeddings = [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
         logger.debug(f"Generated {len(embeddings)} embeddings.")
         return embeddings
 
-    async def create_embeddings(self, texts: List[str]) -> List[List[float]]:
+    async def _embed_batch_with_retry(self, batch: List[str], tokens: int, priority: Priority) -> List[List[float]]:
         """
-        Create embeddings for a list of text inputs, automatically batching requests.
+        Embed one batch under the in-flight limit. Failures that survive the
+        rate limiter's own retries are retried BATCH_RETRIES times for this
+        batch only; bad requests are not retried.
+        """
+        for attempt in range(self.BATCH_RETRIES + 1):
+            try:
+                async with self._in_flight:
+                    return await self._embed_batch(batch, priority, tokens)
+            except BadRequestError:
+                raise
+            except Exception as e:
+                if attempt >= self.BATCH_RETRIES:
+                    raise
+                backoff = 2 ** attempt
+                logger.warning(f"Embedding batch of {len(batch)} texts failed ({e}); retrying in {backoff}s")
+                await asyncio.sleep(backoff)
+
+    async def create_embeddings(self, texts: List[str], priority: Priority = Priority.BULK) -> List[List[float]]:
+        """
+        Create embeddings for a list of text inputs, automatically batching
+        requests by item count and token count. Batches are sent concurrently
+        (at most `max_in_flight` at a time) and the result keeps input order.
 
         Args:
             texts (List[str]): List of text strings to embed.
+            priority (Priority): Rate-limiter priority class (bulk ingestion by default).
 
         Returns:
             List[List[float]]: List of vector embeddings.
@@ -66,11 +139,20 @@ class AzureEmbeddingService:
         if not texts:
             return []
 
-        all_embeddings = []
-        for i in range(0, len(texts), self.batch_size):
-            batch = texts[i:i + self.batch_size]
-            batch_embeddings = await self._embed_batch(batch)
-            all_embeddings.extend(batch_embeddings)
+        # Tokenizing is CPU-bound; keep it off the event loop.
+        batches = await asyncio.to_thread(self._make_batches, texts)
+        tasks = [
+            asyncio.create_task(self._embed_batch_with_retry(batch, tokens, priority))
+            for batch, tokens in batches
+        ]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        all_embeddings = [embedding for batch_embeddings in results for embedding in batch_embeddings]
 
         logger.info(f"Successfully generated {len(all_embeddings)} embeddings.")
         return all_embeddings
@@ -82,11 +164,12 @@ class AzureEmbeddingService:
         embeddings = await self.create_embeddings([text])
         return embeddings[0] if embeddings else []
 
-    async def get_embedding(self, text: str):
+    async def close(self):
+        """Close the underlying connection pool."""
+        await self.client.close()
 
-        response = await self.client.embeddings.create(
-            model="text-embedding-3-large",
-            input=[text]
-        )
+    async def get_embedding(self, text: str, priority: Priority = Priority.INTERACTIVE):
+
+        response = await self._create([text], priority)
         
-        return response.data[0].embedding
\ No newline at end of file
+        return response.data[0].embedding
@@ -15,6 +15,8 @@ from agent_framework.devui import DevServer
 from agent_framework import WorkflowAgent
 
 from tools.checklist_process import ChecklistProcessor
+from service.client_registry import AzureClientRegistry
+from service.job_engine import JobEngine
 from apis import agent_catalog_router, checklist_router, ui_config_router, workflows_router
 
 logger = get_logger(__name__)
@@ -31,6 +33,17 @@ app.include_router(ui_config_router)
 app.include_router(agent_catalog_router)
 app.include_router(workflows_router)
 
+
+@app.on_event("startup")
+async def start_job_engine():
+    await JobEngine.start()
+
+
+@app.on_event("shutdown")
+async def close_shared_clients():
+    await JobEngine.stop()
+    await AzureClientRegistry.aclose()
+
 def run_api():
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
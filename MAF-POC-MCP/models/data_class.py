@@ -1,9 +1,39 @@
 import re
+import sys
 import uuid
+from array import array
 
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import Any, Dict, Iterator, List, Literal, Optional, Tuple
 
+_P_INNER = re.compile(r"\([^()]*\)")
+_WHITESPACE = re.compile(r"\s+")
+# Namespace for deterministic sibling-group ids (stable across runs and cached templates).
+_GROUP_ID_NAMESPACE = uuid.UUID("6f1c8a52-9a0e-4d8e-9a61-2f3c5b7d9e10")
+
+
+def sibling_group_id(root_block_id: Optional[str], parent_key: Optional[str], group_key: str, chunk: int) -> str:
+    """Deterministic sibling-group id, so repeated compiles of a template agree."""
+    name = f"{root_block_id}\x1f{parent_key}\x1f{group_key}\x1f{chunk}"
+    return str(uuid.uuid5(_GROUP_ID_NAMESPACE, name))
+
+
+@lru_cache(maxsize=65536)
+def _normalized_guidance_key(text: str) -> Optional[str]:
+    s = text.strip()
+    if not s:
+        return None
+
+    # 1) fully remove nested/adjacent parentheses
+    s = Block._strip_all_parens(s)
+
+    # 2-4) split/normalize/rejoin
+    parts = [_WHITESPACE.sub(" ", p).strip() for p in s.split(",")]
+    parts = [p for p in parts if p]
+    return ", ".join(parts) if parts else None
+
+
 @dataclass
 class BlockSiblingGroup:
     leaves: List["Block"]
@@ -74,7 +104,6 @@ class Block:
         Remove all balanced parenthetical segments, including nested ones.
         Repeatedly strips innermost '(... )' until none remain.
         """
-        _P_INNER = re.compile(r"\([^()]*\)")
         prev = None
         while s != prev:
             prev = s
@@ -90,20 +119,14 @@ class Block:
           2) split on commas,
           3) trim + collapse whitespace,
           4) rejoin with ', '.
+        Results are memoized since guidance strings repeat across a template.
         """
         if not text:
             return None
-        s = text.strip()
-        if not s:
-            return None
-
-        # 1) fully remove nested/adjacent parentheses
-        s = cls._strip_all_parens(s)
+        return _normalized_guidance_key(text)
 
-        # 2-4) split/normalize/rejoin
-        parts = [re.sub(r"\s+", " ", p).strip() for p in s.split(",")]
-        parts = [p for p in parts if p]
-        return ", ".join(parts) if parts else None
+    def _group_id(self, parent_key: Optional[str], group_key: str, chunk: int) -> str:
+        return sibling_group_id(self.blockId, parent_key, group_key, chunk)
 
     def walk_with_ancestors(
         self, ancestors: Tuple["Block", ...] = ()
@@ -128,6 +151,7 @@ class Block:
 
         If max_group_size is provided (> 0), large sibling groups are split into
         consecutive chunks of at most that size (each with a unique group_id).
+        Group ids are derived from (parent, guidance key, chunk), not random.
         """
         # Key: (parentId, normalizedGuidanceKey)
         groups: Dict[
@@ -162,12 +186,12 @@ class Block:
             else None
         )
 
-        for _, (ancestors, leaves, group_key_str) in groups.items():
+        for (parent_key, _), (ancestors, leaves, group_key_str) in groups.items():
             if not limit:
                 yield BlockSiblingGroup(
                     ancestors=ancestors,
                     leaves=list(leaves),
-                    group_id=str(uuid.uuid4()),
+                    group_id=self._group_id(parent_key, group_key_str, 0),
                     group_key=group_key_str,
                 )
             else:
@@ -175,7 +199,7 @@ class Block:
                     yield BlockSiblingGroup(
                         ancestors=ancestors,
                         leaves=leaves[i : i + limit],
-                        group_id=str(uuid.uuid4()),
+                        group_id=self._group_id(parent_key, group_key_str, i // limit),
                         group_key=group_key_str,
                     )
 
@@ -232,3 +256,220 @@ class Block:
     ) -> Tuple["Block", ...]:
         return tuple(cls.from_wire(i) for i in items or [])
 
+
+
+class ChecklistNode:
+    """Lightweight view of one node of a ChecklistTree (no per-node storage)."""
+    __slots__ = ("tree", "index")
+
+    def __init__(self, tree: "ChecklistTree", index: int):
+        self.tree = tree
+        self.index = index
+
+    @property
+    def blockId(self) -> str:
+        return self.tree.block_ids[self.index]
+
+    @property
+    def blockType(self) -> str:
+        return self.tree.block_types[self.index]
+
+    @property
+    def title(self) -> str:
+        return self.tree.titles[self.index]
+
+    @property
+    def responseOptions(self) -> Tuple[str, ...]:
+        return self.tree.response_options[self.index]
+
+    @property
+    def guidanceText(self) -> str:
+        return self.tree.guidance[self.index]
+
+    @property
+    def parentBlockId(self) -> Optional[str]:
+        return self.tree.parent_block_ids[self.index]
+
+    @property
+    def isAIResponseExpected(self) -> bool:
+        return bool(self.tree.ai_expected[self.index])
+
+    def ancestors(self) -> List["ChecklistNode"]:
+        """Ancestors ordered root -> parent, computed from parent indices on demand."""
+        return [ChecklistNode(self.tree, i) for i in self.tree.ancestor_indices(self.index)]
+
+    def to_wire(self) -> Dict[str, Any]:
+        return self.tree.node_to_wire(self.index)
+
+
+class ChecklistTree:
+    """
+    Compact, array-backed checklist template.
+
+    Nodes are stored in DFS pre-order as parallel lists (one slot per node)
+    plus an `array` of parent indices, with repeated strings interned and
+    response option tuples shared. Ancestor paths are derived lazily from
+    the parent indices instead of materializing a tuple per node, and wire
+    output reuses one record per ancestor across all groups that share it.
+    Groups match Block.walk_leaf_groups (same order, keys and group ids).
+    The one deliberate difference: a null guidanceText is stored and
+    emitted as "" (Block keeps None). Both group under the same empty key,
+    and leaf fingerprints always hash a string.
+    """
+    __slots__ = (
+        "block_ids", "block_types", "titles", "response_options", "guidance",
+        "parent_block_ids", "ai_expected", "parents", "roots", "_ancestor_wire",
+    )
+
+    def __init__(self):
+        self.block_ids: List[str] = []
+        self.block_types: List[str] = []
+        self.titles: List[str] = []
+        self.response_options: List[Tuple[str, ...]] = []
+        self.guidance: List[str] = []
+        self.parent_block_ids: List[Optional[str]] = []
+        self.ai_expected = bytearray()
+        self.parents = array("i")
+        self.roots: List[int] = []
+        self._ancestor_wire: Dict[int, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self.block_ids)
+
+    @classmethod
+    def from_blocks(cls, blocks: List[Dict[str, Any]]) -> "ChecklistTree":
+        """Build the tree from raw template block dicts (iterative, so depth is unbounded)."""
+        tree = cls()
+        option_tuples: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+        intern = sys.intern
+
+        stack: List[Tuple[Dict[str, Any], int]] = [(b, -1) for b in reversed(blocks or [])]
+        while stack:
+            obj, parent = stack.pop()
+            index = len(tree.block_ids)
+            options = tuple(obj.get("responseOptions", []) or [])
+            parent_block_id = obj.get("parentBlockId")
+            if parent_block_id is None and parent >= 0:
+                parent_block_id = tree.block_ids[parent]
+
+            tree.block_ids.append(obj.get("blockId"))
+            tree.block_types.append(intern(obj.get("blockType") or ""))
+            tree.titles.append(obj.get("title", ""))
+            tree.response_options.append(option_tuples.setdefault(options, options))
+            tree.guidance.append(intern(obj.get("guidanceText", "") or ""))
+            tree.parent_block_ids.append(parent_block_id)
+            tree.ai_expected.append(1 if obj.get("isAIResponseExpected", False) else 0)
+            tree.parents.append(parent)
+            if parent < 0:
+                tree.roots.append(index)
+
+            stack.extend((child, index) for child in reversed(obj.get("blocks", []) or []))
+        return tree
+
+    def node(self, index: int) -> ChecklistNode:
+        return ChecklistNode(self, index)
+
+    def ancestor_indices(self, index: int) -> List[int]:
+        path = []
+        parent = self.parents[index]
+        while parent >= 0:
+            path.append(parent)
+            parent = self.parents[parent]
+        path.reverse()
+        return path
+
+    def node_to_wire(self, index: int) -> Dict[str, Any]:
+        """Same shape as Block.to_wire() without children."""
+        return {
+            "blockId": self.block_ids[index],
+            "blockType": self.block_types[index],
+            "title": self.titles[index],
+            "responseOptions": list(self.response_options[index]),
+            "guidanceText": self.guidance[index],
+            "blocks": [],
+            "parentBlockId": self.parent_block_ids[index],
+        }
+
+    def _shared_ancestor_wire(self, index: int) -> Dict[str, Any]:
+        record = self._ancestor_wire.get(index)
+        if record is None:
+            record = self._ancestor_wire[index] = self.node_to_wire(index)
+        return record
+
+    def leaf_groups(
+        self, max_group_size: Optional[int] = None
+    ) -> Iterator[Tuple[int, List[int], str, str]]:
+        """
+        Yield (parent index, leaf indices, group key, group id) for every
+        sibling group of isAIResponseExpected nodes, in DFS order, splitting
+        groups larger than `max_group_size`.
+        """
+        groups: Dict[Tuple[int, int, Optional[str]], List[int]] = {}
+        root = -1
+        for index in range(len(self.block_ids)):
+            parent = self.parents[index]
+            if parent < 0:
+                root = index
+            if not self.ai_expected[index]:
+                continue
+            key = (root, parent, Block._guidance_group_key(self.guidance[index]))
+            groups.setdefault(key, []).append(index)
+
+        limit = (
+            max_group_size
+            if (isinstance(max_group_size, int) and max_group_size > 0)
+            else None
+        )
+        for (root, parent, guidance_key), leaves in groups.items():
+            group_key = guidance_key or ""
+            parent_key = self.block_ids[parent] if parent >= 0 else None
+            chunks = [leaves] if not limit else [leaves[i : i + limit] for i in range(0, len(leaves), limit)]
+            for chunk_idx, chunk in enumerate(chunks):
+                yield parent, chunk, group_key, sibling_group_id(self.block_ids[root], parent_key, group_key, chunk_idx)
+
+    def to_wire_groups(self, max_group_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Wire sibling groups in the BlockSiblingGroup.to_wire() layout. Ancestor
+        records are shared by reference between groups; treat them as read-only.
+        """
+        wire_groups = []
+        ancestor_lists: Dict[int, List[Dict[str, Any]]] = {}
+        for parent, leaves, group_key, group_id in self.leaf_groups(max_group_size):
+            ancestors = ancestor_lists.get(parent)
+            if ancestors is None:
+                path = self.ancestor_indices(parent) + [parent] if parent >= 0 else []
+                ancestors = ancestor_lists[parent] = [self._shared_ancestor_wire(i) for i in path]
+            wire_groups.append({
+                "groupId": group_id,
+                "groupKey": group_key,
+                "ancestors": ancestors,
+                "leaves": [self.node_to_wire(i) for i in leaves],
+            })
+        return wire_groups
+
+
+@dataclass
+class ChecklistWorkItem:
+    """
+    Unit of work flowing through the checklist answering pipeline: a single
+    leaf, or a sibling group answered together when group_id is set.
+    Each stage fills in the next field (query vector -> retrieved data and
+    the packed prompt context).
+    """
+    leaves: List[Dict[str, Any]]
+    query: str
+    group_id: Optional[str] = None
+    group_key: Optional[str] = None
+    query_vector: Optional[List[float]] = None
+    retrieved_data: Optional[List[Dict[str, Any]]] = None
+    context: Optional[str] = None
+
+    @property
+    def is_group(self) -> bool:
+        return self.group_id is not None
+
+    @property
+    def label(self) -> str:
+        if self.is_group:
+            return f"group {self.group_id} ({len(self.leaves)} leaves)"
+        return f"block {self.leaves[0].get('blockId')}"
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import Any, Optional
+from typing import Any, Literal, Optional
+from pydantic import Field
 from common_server.schemas.cognitive_service import SearchConfig as SearchConfigDto
 from common_server.schemas.cosmos import CosmosConfigDto
 from common_server.schemas.base import BaseDto
@@ -12,6 +13,7 @@ class EmbeddingModelConfig(BaseDto):
     model_name: str
     api_key: str
     endpoint: str
+    dimensions: Optional[int] = None
 
 class OpenAIChatModelConfig(BaseDto):
     deployment_name: str
@@ -27,6 +29,21 @@ class RagIngestionDto(BaseDto):
     openai_chat_model_config: OpenAIChatModelConfig
     max_retries: int = 3
 
+class IngestionPipelineConfig(BaseDto):
+    """Tuning knobs for the streaming RAG ingestion pipeline (optional `ingestion_config` section)."""
+    chunk_max_tokens: int = Field(default=500, description="Token limit of one text chunk.")
+    chunk_concurrency: int = Field(default=2, description="Concurrent chunking workers (tokenization runs off the event loop).")
+    embedding_batch_size: int = Field(default=64, description="Chunks embedded per embeddings request.")
+    embedding_concurrency: int = Field(default=4, description="Concurrent embeddings requests.")
+    index_batch_size: int = Field(default=100, description="Chunks uploaded per search-index request.")
+    index_concurrency: int = Field(default=2, description="Concurrent search-index uploads.")
+    batch_timeout_seconds: float = Field(default=1.0, description="Flush a partial batch this long after its first item arrives.")
+    queue_size: int = Field(default=256, description="Bound of the queue in front of every ingestion stage.")
+    incremental: bool = Field(default=False, description="Diff the chunk set against the index: upload only new chunks and delete stale ones.")
+    embedding_cache_enabled: bool = Field(default=True, description="Reuse embeddings of previously seen chunk texts from the local cache.")
+    embedding_cache_path: str = Field(default="cache/embeddings.sqlite", description="sqlite file backing the embedding cache.")
+    embedding_cache_max_mb: int = Field(default=1024, description="Size budget of the embedding cache before LRU eviction.")
+
 class RagRetrievalConfig(BaseDto):
     query: str
     filter: str = "request_id eq '{request_id}'"
@@ -37,4 +54,42 @@ class RagRetrievalDto(BaseDto):
     search_config: SearchConfigDto
     embedding_config: EmbeddingModelConfig
     openai_chat_model_config: OpenAIChatModelConfig
-    max_retries: int = 3
\ No newline at end of file
+    max_retries: int = 3
+
+class ChecklistProcessingConfig(BaseDto):
+    """Tuning knobs for the checklist answering pipeline (optional `processing_config` section)."""
+    embedding_concurrency: int = Field(default=4, description="Concurrent query-embedding calls.")
+    search_concurrency: int = Field(default=8, description="Concurrent vector searches.")
+    answer_concurrency: Optional[int] = Field(default=None, description="Concurrent LLM answer calls; falls back to max_workers.")
+    queue_size: int = Field(default=100, description="Bound of the queue in front of every pipeline stage.")
+    group_mode: bool = Field(default=False, description="Answer sibling leaves sharing a guidance key with one retrieval and one LLM call.")
+    max_group_size: Optional[int] = Field(default=None, description="Split sibling groups larger than this into consecutive chunks.")
+    answer_cache_enabled: bool = Field(default=False, description="Serve repeated LLM answers from the persistent on-disk cache.")
+    answer_cache_path: str = Field(default="cache/checklist_answers.sqlite", description="sqlite file backing the LLM answer cache.")
+    answer_cache_max_mb: int = Field(default=512, description="Size budget of the answer cache before LRU eviction.")
+    retrieval_cache_enabled: bool = Field(default=False, description="Opt in to reusing vector search results for identical or near-identical queries within a request.")
+    retrieval_cache_similarity: float = Field(default=0.97, description="Cosine similarity above which a cached query's results are reused.")
+    context_token_budget: int = Field(default=3000, description="Token budget for the retrieved evidence packed into each prompt.")
+    context_overlap_threshold: float = Field(default=0.8, description="Drop a chunk when this share of its word shingles already appears in a packed chunk.")
+    incremental: bool = Field(default=False, description="Carry forward answers from the previous answer file for leaves whose fingerprint is unchanged.")
+    template_cache_enabled: bool = Field(default=False, description="Opt in to reusing compiled checklist templates from the local cache, keyed by blob ETag. One pickle per template version is kept in template_cache_dir and is not pruned.")
+    stream_template: bool = Field(default=False, description="Parse the template incrementally from the blob download and answer each section as soon as it is parsed.")
+    template_cache_dir: str = Field(default="cache/templates", description="Directory holding compiled checklist templates.")
+    stream_answers: bool = Field(default=False, description="Opt in to streaming answered leaves to an NDJSON blob (staged blocks) while the run is in progress, with a manifest, a range-read index and a compact, fingerprinted _answer.json.")
+    stream_block_bytes: int = Field(default=4 * 1024 * 1024, description="Buffered NDJSON bytes staged and committed as one block.")
+    assemble_answer_json: bool = Field(default=True, description="Assemble the ordered _answer.json document once the run completes.")
+    cascade_enabled: bool = Field(default=False, description="Answer with cascade_chat_model_config first and re-ask openai_chat_model_config only for low-confidence answers.")
+    cascade_chat_model_config: Optional[OpenAIChatModelConfig] = Field(default=None, description="Small, fast deployment answering first when the cascade is enabled.")
+    cascade_confidence_threshold: float = Field(default=0.85, description="Answers below this confidence (0..1) are escalated to the large deployment.")
+    cascade_confidence_source: Literal["logprobs", "self_reported"] = Field(default="logprobs", description="Confidence from the answer tokens' logprobs, or a score the model reports in the answer.")
+    batch_mode: bool = Field(default=False, description="Answer through the Azure OpenAI Batch API (JSONL file, submit, poll, merge) instead of live calls.")
+    batch_chat_model_config: Optional[OpenAIChatModelConfig] = Field(default=None, description="Batch deployment; defaults to openai_chat_model_config. Point its endpoint at batch_stand_in.py to run offline.")
+    batch_poll_seconds: float = Field(default=30.0, description="Interval between batch status polls.")
+    batch_timeout_hours: float = Field(default=24.0, description="Cancel the batch after this long and merge whatever finished.")
+    batch_dir: str = Field(default="cache/batches", description="Directory for the JSONL batch input files.")
+    shard_mode: bool = Field(default=False, description="Answer in worker processes fed shards of work items over a TCP work queue.")
+    shard_size: int = Field(default=50, description="Work items per shard.")
+    shard_local_workers: int = Field(default=4, description="Worker processes spawned on the coordinator's machine.")
+    shard_bind_address: str = Field(default="127.0.0.1:0", description="host:port of the shard queues; bind a reachable address to add workers from other hosts (python -m tools.checklist_shard --connect HOST:PORT).")
+    shard_remote_workers: int = Field(default=0, description="Workers expected to join from other hosts; each deployment's rate budget is split across local and remote workers.")
+    shard_timeout_seconds: float = Field(default=900.0, description="Re-queue a shard's unanswered items after this long without a result.")
@@ -16,6 +16,7 @@ class IndexingToolCallDto(BaseModel):
     search_config: SearchConfigDto
     request_id: str
     extracted_chunks: dict
+    embedding_config: Optional[EmbeddingModelConfig] = None
     
 
 
@@ -54,6 +55,11 @@ class ChecklistProcessingToolCallDto(BaseModel):
     prompt: PromptDto = Field(description="Prompt configuration")
 
 
+class ChecklistLoadRequestDto(ChecklistProcessingToolCallDto):
+    """Body of POST /checklist/load-checklist; `resume` is not offered to agents."""
+    resume: bool = Field(default=False, description="Resume from the request's answer journal, skipping leaves already answered")
+
+
 class SuperVisorAgentPayloadDto(BaseModel):
     """DTO for Supervisor Agent Payload."""
     prompt: PromptDto
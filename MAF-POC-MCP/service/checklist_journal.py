@@ -0,0 +1,175 @@
+import os
+import json
+import asyncio
+import logging
+from typing import Dict, IO, Iterable, List, Optional
+from service.checkpoint_service import CHECKPOINT_DIR
+
+logger = logging.getLogger("ChecklistJournal")
+
+# Leaf fields persisted per answered checklist item.
+JOURNAL_FIELDS = ("blockId", "fingerprint", "answer", "rationale", "status")
+
+
+def _to_json(o):
+    # Same fallback as ChecklistProcessor.push_file_to_blob (dataclasses such as MetaData).
+    return o.__dict__ if hasattr(o, "__dict__") else str(o)
+
+
+class ChecklistJournal:
+    """
+    Append-only JSONL journal of answered checklist leaves for one request.
+
+    Every finished work item is appended and fsync'ed before the pipeline
+    moves on, so a crashed run can be resumed without re-answering the
+    leaves it already completed. Only byte offsets are kept in memory; the
+    final answer file is assembled by reading the records back from disk.
+    A submitted Batch API job is journaled too (`record_batch`), so a
+    resumed run can wait for it instead of submitting the work again.
+    """
+
+    def __init__(self, request_id: str, directory: str = CHECKPOINT_DIR):
+        self.request_id = request_id
+        self.path = os.path.join(directory, f"{request_id}.checklist.jsonl")
+        self._offsets: Dict[str, int] = {}
+        self.batch_id: Optional[str] = None
+        self._lock = asyncio.Lock()
+        self._file: Optional[IO[bytes]] = None
+
+    def open(self, resume: bool = False) -> "ChecklistJournal":
+        """Open the journal, indexing existing records on resume or truncating it otherwise."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if resume and os.path.exists(self.path):
+            self._index_existing()
+            logger.info(f"Resuming request {self.request_id} with {len(self._offsets)} journaled leaves")
+            self._file = open(self.path, "ab")
+        else:
+            self._file = open(self.path, "wb")
+        return self
+
+    def _index_existing(self):
+        valid_end = 0
+        with open(self.path, "rb") as f:
+            offset = 0
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-write; everything after it is dropped.
+                    break
+                if record.get("blockId"):
+                    self._offsets[record["blockId"]] = offset
+                elif record.get("batchId"):
+                    self.batch_id = record["batchId"]
+                offset += len(line)
+                valid_end = offset
+        with open(self.path, "r+b") as f:
+            f.truncate(valid_end)
+
+    def __contains__(self, block_id: str) -> bool:
+        return block_id in self._offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def read(self, block_id: str) -> Optional[Dict]:
+        offset = self._offsets.get(block_id)
+        if offset is None:
+            return None
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def completed(self, leaf: Dict) -> bool:
+        """True if the leaf was answered in a previous attempt and has not changed since."""
+        record = self.read(leaf.get("blockId")) if leaf.get("blockId") in self else None
+        return (
+            record is not None
+            and record.get("status") == "processed"
+            and record.get("fingerprint") == leaf.get("fingerprint")
+        )
+
+    def _write(self, records: List[Dict]):
+        offset = self._file.tell()
+        for record in records:
+            line = (json.dumps(record, ensure_ascii=False, default=_to_json) + "\n").encode("utf-8")
+            self._file.write(line)
+            if record.get("blockId"):
+                self._offsets[record["blockId"]] = offset
+            offset += len(line)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    async def append(self, leaves: Iterable[Dict]):
+        """Durably record the given leaves (only their answer fields)."""
+        records = [
+            {key: leaf.get(key) for key in JOURNAL_FIELDS}
+            for leaf in leaves
+            if leaf.get("blockId")
+        ]
+        if not records:
+            return
+        async with self._lock:
+            await asyncio.to_thread(self._write, records)
+
+    async def record_batch(self, batch_id: str):
+        """Durably record the id of the Batch API job answering this request."""
+        async with self._lock:
+            await asyncio.to_thread(self._write, [{"batchId": batch_id}])
+        self.batch_id = batch_id
+
+    def write_answer_file(
+        self,
+        out: IO[bytes],
+        meta_data: Dict,
+        leaves: Iterable[Dict],
+        compact: bool = True,
+        omit_fields: Iterable[str] = (),
+        **extra,
+    ):
+        """
+        Stream the final answer document to `out`, merging each leaf with its
+        journaled answer, one leaf at a time.
+
+        `compact=False` reproduces the indented `{"metaData", "blocks"}`
+        layout of the original answer file byte for byte; `omit_fields` drops
+        journal-only fields (such as `fingerprint`) from every leaf.
+        """
+        omit = set(omit_fields)
+        if compact:
+            dump = lambda obj, indent: json.dumps(obj, ensure_ascii=False, default=_to_json)
+            separator, open_blocks, close_blocks = b", ", b', "blocks": [', b"]}"
+        else:
+            dump = lambda obj, indent: json.dumps(obj, indent=2, default=_to_json).replace("\n", "\n" + indent)
+            separator, open_blocks, close_blocks = b",\n    ", b',\n  "blocks": [\n    ', b"\n  ]\n}"
+
+        header = dump({"metaData": meta_data, **extra}, "")
+        out.write(header[:header.rindex("}")].rstrip().encode("utf-8"))
+        wrote_leaf = False
+        with open(self.path, "rb") as journal:
+            for leaf in leaves:
+                merged = dict(leaf)
+                offset = self._offsets.get(leaf.get("blockId"))
+                if offset is not None:
+                    journal.seek(offset)
+                    merged.update(json.loads(journal.readline()))
+                for field in omit:
+                    merged.pop(field, None)
+                out.write(separator if wrote_leaf else open_blocks)
+                out.write(dump(merged, "    ").encode("utf-8"))
+                wrote_leaf = True
+        if wrote_leaf:
+            out.write(close_blocks)
+        else:
+            out.write(b', "blocks": []}' if compact else b',\n  "blocks": []\n}')
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        """Remove the journal once its answers have been published."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
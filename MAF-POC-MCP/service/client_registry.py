@@ -0,0 +1,161 @@
+import json
+import logging
+from typing import Any, Dict, Optional, Tuple, Type, TypeVar
+
+from pydantic import BaseModel
+
+from common_server.ai.azure_openai import AsyncAzureOpenAIChat
+from common_server.cognitive_service.search_service import ChunkIndexer
+from common_server.db.cosmos import CosmosDBStorage
+from common_server.storage.blob import AzureBlobStorageManager
+from common_server.utils.embedding import AzureEmbeddingService
+
+logger = logging.getLogger("ClientRegistry")
+
+T = TypeVar("T", bound=BaseModel)
+
+MAX_VALIDATED_DTOS = 256
+
+
+class AzureClientRegistry:
+    """
+    Process-wide cache of Azure clients keyed by their configuration.
+
+    Tools ask the registry for a client instead of constructing one per call,
+    so each endpoint/key/deployment/index pays its TLS handshake and index
+    metadata round trip once per process. Shared clients must not be closed
+    by callers; `aclose` releases everything at shutdown.
+    """
+    _embedding_services: Dict[Tuple, AzureEmbeddingService] = {}
+    _chunk_indexers: Dict[Tuple, ChunkIndexer] = {}
+    _chat_clients: Dict[Tuple, AsyncAzureOpenAIChat] = {}
+    _blob_managers: Dict[Tuple, AzureBlobStorageManager] = {}
+    _cosmos_stores: Dict[Tuple, CosmosDBStorage] = {}
+    _validated: Dict[Tuple, BaseModel] = {}
+
+    @classmethod
+    def validate(cls, dto_cls: Type[T], payload: Any) -> T:
+        """Validate a config payload into `dto_cls` once and reuse the result."""
+        if isinstance(payload, dto_cls):
+            return payload
+        try:
+            key = (dto_cls, json.dumps(payload, sort_keys=True, default=str))
+        except TypeError:
+            return dto_cls.model_validate(payload)
+        dto = cls._validated.get(key)
+        if dto is None:
+            dto = dto_cls.model_validate(payload)
+            if len(cls._validated) >= MAX_VALIDATED_DTOS:
+                cls._validated.clear()
+            cls._validated[key] = dto
+        return dto
+
+    @classmethod
+    def get_embedding_service(cls, embedding_config) -> AzureEmbeddingService:
+        dimensions = getattr(embedding_config, "dimensions", None)
+        key = (embedding_config.endpoint, embedding_config.api_key, embedding_config.model_name, dimensions)
+        service = cls._embedding_services.get(key)
+        if service is None:
+            service = AzureEmbeddingService(
+                api_key=embedding_config.api_key,
+                endpoint=embedding_config.endpoint,
+                deployment_name=embedding_config.model_name,
+                dimensions=dimensions
+            )
+            cls._embedding_services[key] = service
+        return service
+
+    @classmethod
+    def get_chunk_indexer(cls, search_config, embedding_dim: Optional[int] = None) -> ChunkIndexer:
+        # The index existence and vector dimension check in ChunkIndexer.__init__ runs once per key.
+        embedding_dim = embedding_dim or ChunkIndexer.DEFAULT_EMBEDDING_DIM
+        key = (search_config.endpoint, search_config.api_key, search_config.index_name, embedding_dim)
+        indexer = cls._chunk_indexers.get(key)
+        if indexer is None:
+            indexer = ChunkIndexer(search_config=search_config, embedding_dim=embedding_dim)
+            cls._chunk_indexers[key] = indexer
+        return indexer
+
+    @classmethod
+    def get_chat_client(cls, openai_chat_model_config) -> AsyncAzureOpenAIChat:
+        key = (
+            openai_chat_model_config.endpoint,
+            openai_chat_model_config.api_key,
+            openai_chat_model_config.deployment_name,
+            openai_chat_model_config.api_version,
+        )
+        chat = cls._chat_clients.get(key)
+        if chat is None:
+            chat = AsyncAzureOpenAIChat(
+                api_key=openai_chat_model_config.api_key,
+                endpoint=openai_chat_model_config.endpoint,
+                deployment_name=openai_chat_model_config.deployment_name,
+                api_version=openai_chat_model_config.api_version
+            )
+            cls._chat_clients[key] = chat
+        return chat
+
+    @classmethod
+    def get_blob_manager(cls, endpoint: str, api_key: str, container_name: str) -> AzureBlobStorageManager:
+        key = (endpoint, api_key, container_name)
+        manager = cls._blob_managers.get(key)
+        if manager is None:
+            manager = AzureBlobStorageManager(
+                endpoint=endpoint,
+                api_key=api_key,
+                container_name=container_name,
+            )
+            cls._blob_managers[key] = manager
+        return manager
+
+    @classmethod
+    def get_cosmos_storage(cls, cosmos_config) -> CosmosDBStorage:
+        key = (
+            cosmos_config.endpoint,
+            cosmos_config.key,
+            cosmos_config.database_name,
+            cosmos_config.container_name,
+        )
+        storage = cls._cosmos_stores.get(key)
+        if storage is None:
+            storage = CosmosDBStorage(
+                endpoint=cosmos_config.endpoint,
+                key=cosmos_config.key,
+                database_name=cosmos_config.database_name,
+                container_name=cosmos_config.container_name,
+            )
+            cls._cosmos_stores[key] = storage
+        return storage
+
+    @classmethod
+    async def aclose(cls):
+        """Close every cached client. Safe to call more than once."""
+        for service in list(cls._embedding_services.values()):
+            try:
+                await service.close()
+            except Exception as e:
+                logger.warning(f"Failed to close embedding client: {e}")
+        for manager in list(cls._blob_managers.values()):
+            try:
+                await manager.close()
+            except Exception as e:
+                logger.warning(f"Failed to close blob client: {e}")
+        for indexer in list(cls._chunk_indexers.values()):
+            try:
+                indexer.close()
+            except Exception as e:
+                logger.warning(f"Failed to close search client: {e}")
+        for storage in list(cls._cosmos_stores.values()):
+            try:
+                storage.close()
+            except Exception as e:
+                logger.warning(f"Failed to close cosmos client: {e}")
+        await AsyncAzureOpenAIChat.aclose_all()
+
+        cls._embedding_services.clear()
+        cls._blob_managers.clear()
+        cls._chunk_indexers.clear()
+        cls._cosmos_stores.clear()
+        cls._chat_clients.clear()
+        cls._validated.clear()
+        logger.info("Closed all shared Azure clients")
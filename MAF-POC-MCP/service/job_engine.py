@@ -0,0 +1,237 @@
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from service.config_service import ConfigService
+from service.job_store import FINISHED_STATUSES, JobStore, SqliteJobStore
+
+logger = logging.getLogger("JobEngine")
+
+
+class JobHandle:
+    """Passed to a job handler: its id, request_id and a progress reporter."""
+
+    def __init__(self, engine: "JobEngine", job: Dict[str, Any]):
+        self.job_id = job["job_id"]
+        self.request_id = job["request_id"]
+        self.attempts = job.get("attempts", 0)
+        self._engine = engine
+        self._last_persist = 0.0
+        self._persisting: Optional[asyncio.Task] = None
+
+    def report(self, progress: Dict[str, Any], force: bool = False):
+        """
+        Record progress; persisted at most every PROGRESS_INTERVAL seconds
+        unless forced, in a worker thread so the caller's loop never blocks.
+        """
+        self._engine._progress[self.job_id] = progress
+        now = time.monotonic()
+        if force or now - self._last_persist >= self._engine.PROGRESS_INTERVAL:
+            self._last_persist = now
+            self._persisting = asyncio.get_running_loop().create_task(self._persist(self._persisting, progress))
+
+    async def _persist(self, previous: Optional[asyncio.Task], progress: Dict[str, Any]):
+        # Writes are chained so an older snapshot never lands after a newer one.
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)
+        await asyncio.to_thread(self._engine.store.update, self.job_id, progress=progress)
+
+    async def flush(self):
+        """Wait for the pending progress write, if any."""
+        if self._persisting is not None:
+            await asyncio.gather(self._persisting, return_exceptions=True)
+
+
+JobHandler = Callable[[Dict[str, Any], JobHandle], Awaitable[Any]]
+
+
+class JobEngine:
+    """
+    Process-wide background job engine.
+
+    Jobs are persisted in a pluggable JobStore (sqlite by default, path from
+    JOB_STORE_PATH) and executed by a bounded pool of JOB_WORKERS asyncio
+    workers. Queued jobs are kept per request_id and picked round-robin
+    across request_ids, so one large submitter cannot starve the others;
+    jobs of the same request_id never run concurrently. Jobs interrupted by
+    a restart are re-queued on start, and their handler sees attempts > 1.
+    """
+    PROGRESS_INTERVAL = 2.0
+
+    store: Optional[JobStore] = None
+    _handlers: Dict[str, JobHandler] = {}
+    _queues: "OrderedDict[str, deque[str]]" = OrderedDict()
+    _running: Dict[str, Tuple[asyncio.Task, asyncio.Event]] = {}
+    _running_requests: set = set()
+    _progress: Dict[str, Dict[str, Any]] = {}
+    _workers: List[asyncio.Task] = []
+    _wakeup: Optional[asyncio.Event] = None
+
+    @classmethod
+    def register(cls, kind: str, handler: JobHandler):
+        cls._handlers[kind] = handler
+
+    @classmethod
+    async def start(cls, store: Optional[JobStore] = None, workers: Optional[int] = None):
+        """Open the store, re-queue interrupted jobs and start the worker pool."""
+        if cls._workers:
+            return
+        cls.store = store or cls.store or SqliteJobStore(ConfigService.get("JOB_STORE_PATH", "cache/jobs.sqlite"))
+        workers = workers or int(ConfigService.get("JOB_WORKERS", 2))
+        cls._wakeup = asyncio.Event()
+        await asyncio.to_thread(cls.store.requeue_interrupted)
+        for job in await asyncio.to_thread(cls.store.list, "queued", None, None):
+            cls._enqueue(job)
+        cls._workers = [asyncio.create_task(cls._worker(i)) for i in range(max(1, workers))]
+        logger.info(f"Job engine started with {len(cls._workers)} workers, {cls.queued()} queued jobs")
+
+    @classmethod
+    async def stop(cls):
+        """
+        Stop the workers. Running jobs stay 'running' in the store and are
+        re-queued by the next start, so their handlers can resume.
+        """
+        workers, cls._workers = cls._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        cls._queues.clear()
+        cls._running.clear()
+        cls._running_requests.clear()
+
+    @classmethod
+    def _enqueue(cls, job: Dict[str, Any]):
+        cls._queues.setdefault(job["request_id"], deque()).append(job["job_id"])
+        if cls._wakeup is not None:
+            cls._wakeup.set()
+
+    @classmethod
+    def queued(cls) -> int:
+        return sum(len(queue) for queue in cls._queues.values())
+
+    @classmethod
+    async def submit(cls, kind: str, request_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if kind not in cls._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        if cls.store is None:
+            raise RuntimeError("JobEngine.start() must be called before submitting jobs")
+        job = await asyncio.to_thread(cls.store.create, {
+            "job_id": uuid.uuid4().hex,
+            "kind": kind,
+            "request_id": request_id,
+            "status": "queued",
+            "payload": payload,
+        })
+        cls._enqueue(job)
+        logger.info(f"Queued {kind} job {job['job_id']} for request_id={request_id}")
+        return job
+
+    @classmethod
+    def _next_job(cls) -> Optional[Tuple[str, str]]:
+        """
+        Round-robin over request_ids with queued jobs and none running; the
+        picked request_id is marked running before any await can interleave.
+        """
+        for request_id in list(cls._queues):
+            if request_id in cls._running_requests:
+                continue
+            queue = cls._queues.pop(request_id)
+            job_id = queue.popleft()
+            if queue:
+                cls._queues[request_id] = queue  # back of the rotation
+            cls._running_requests.add(request_id)
+            return job_id, request_id
+        return None
+
+    @classmethod
+    async def _worker(cls, index: int):
+        while True:
+            picked = cls._next_job()
+            if picked is None:
+                cls._wakeup.clear()
+                await cls._wakeup.wait()
+                continue
+            job_id, request_id = picked
+            try:
+                job = await asyncio.to_thread(cls.store.get, job_id)
+                if job is None or job["status"] != "queued":
+                    continue
+                await cls._execute(job)
+            finally:
+                cls._running_requests.discard(request_id)
+                cls._wakeup.set()
+
+    @classmethod
+    async def _execute(cls, job: Dict[str, Any]):
+        job_id = job["job_id"]
+        attempts = job.get("attempts", 0) + 1
+        await asyncio.to_thread(
+            cls.store.update, job_id, status="running", started_at=time.time(), attempts=attempts
+        )
+        handle = JobHandle(cls, {**job, "attempts": attempts})
+        task = asyncio.create_task(cls._handlers[job["kind"]](job["payload"] or {}, handle))
+        finished = asyncio.Event()
+        cls._running[job_id] = (task, finished)
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                # The worker itself is being stopped: leave the job 'running' for requeue.
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                raise
+            await handle.flush()
+            await asyncio.to_thread(cls._finish, job_id, "cancelled")
+            logger.info(f"Job {job_id} cancelled")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+            await handle.flush()
+            await asyncio.to_thread(cls._finish, job_id, "failed", error=str(e))
+        else:
+            await handle.flush()
+            await asyncio.to_thread(cls._finish, job_id, "succeeded", result=result)
+            logger.info(f"Job {job_id} succeeded")
+        finally:
+            cls._running.pop(job_id, None)
+            finished.set()
+
+    @classmethod
+    def _finish(cls, job_id: str, status: str, **fields: Any):
+        progress = cls._progress.pop(job_id, None)
+        if progress is not None:
+            fields["progress"] = progress
+        cls.store.update(job_id, status=status, finished_at=time.time(), **fields)
+
+    @classmethod
+    async def get(cls, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await asyncio.to_thread(cls.store.get, job_id)
+        if job is not None and job_id in cls._progress:
+            job["progress"] = cls._progress[job_id]  # fresher than the throttled copy
+        return job
+
+    @classmethod
+    async def list(cls, status: Optional[str] = None, request_id: Optional[str] = None,
+                   limit: int = 100) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(cls.store.list, status, request_id, limit)
+
+    @classmethod
+    async def cancel(cls, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued or running job; finished jobs are returned unchanged."""
+        job = await asyncio.to_thread(cls.store.get, job_id)
+        if job is None or job["status"] in FINISHED_STATUSES:
+            return job
+        running = cls._running.get(job_id)
+        if running is not None:
+            task, finished = running
+            task.cancel()
+            await finished.wait()
+        else:
+            queue = cls._queues.get(job["request_id"])
+            if queue is not None and job_id in queue:
+                queue.remove(job_id)
+                if not queue:
+                    cls._queues.pop(job["request_id"], None)
+            await asyncio.to_thread(cls._finish, job_id, "cancelled")
+        return await cls.get(job_id)
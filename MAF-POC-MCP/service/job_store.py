@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("JobStore")
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+FINISHED_STATUSES = frozenset(("succeeded", "failed", "cancelled"))
+
+_JSON_FIELDS = ("payload", "progress", "result")
+_COLUMNS = (
+    "job_id", "kind", "request_id", "status", "payload", "progress", "result", "error",
+    "attempts", "created_at", "started_at", "finished_at",
+)
+
+
+class JobStore(ABC):
+    """
+    Persistence interface of the background job engine. Jobs are plain
+    dicts with the keys in `_COLUMNS`; payload, progress and result are
+    JSON-serializable values. Implementations must be thread-safe.
+    """
+
+    @abstractmethod
+    def create(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def update(self, job_id: str, **fields: Any) -> None:
+        ...
+
+    @abstractmethod
+    def list(self, status: Optional[str] = None, request_id: Optional[str] = None,
+             limit: Optional[int] = 100) -> List[Dict[str, Any]]:
+        """Jobs oldest first, optionally filtered; `limit=None` returns all."""
+
+    @abstractmethod
+    def requeue_interrupted(self) -> int:
+        """Put jobs left 'running' by a previous process back in the queue."""
+
+
+class SqliteJobStore(JobStore):
+    """Default JobStore: one sqlite table, WAL journal, so jobs survive restarts."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " request_id TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " payload TEXT,"
+            " progress TEXT,"
+            " result TEXT,"
+            " error TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL,"
+            " started_at REAL,"
+            " finished_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_request ON jobs(request_id, created_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def _encode(fields: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            key: json.dumps(value, default=str) if key in _JSON_FIELDS and value is not None else value
+            for key, value in fields.items()
+        }
+
+    @staticmethod
+    def _decode(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        for key in _JSON_FIELDS:
+            if job.get(key) is not None:
+                job[key] = json.loads(job[key])
+        return job
+
+    def create(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        job = {"attempts": 0, "created_at": time.time(), **job}
+        row = self._encode({key: job.get(key) for key in _COLUMNS})
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO jobs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                tuple(row[key] for key in _COLUMNS),
+            )
+            self._conn.commit()
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._decode(row) if row is not None else None
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        unknown = set(fields) - set(_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown job fields: {sorted(unknown)}")
+        row = self._encode(fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {', '.join(f'{key} = ?' for key in row)} WHERE job_id = ?",
+                (*row.values(), job_id),
+            )
+            self._conn.commit()
+
+    def list(self, status: Optional[str] = None, request_id: Optional[str] = None,
+             limit: Optional[int] = 100) -> List[Dict[str, Any]]:
+        clauses, params = [], []
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if request_id is not None:
+            clauses.append("request_id = ?")
+            params.append(request_id)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM jobs{where} ORDER BY created_at ASC LIMIT ?", (*params, -1 if limit is None else limit)
+            ).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def requeue_interrupted(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+            self._conn.commit()
+        if cursor.rowcount:
+            logger.info(f"Re-queued {cursor.rowcount} jobs interrupted by a restart")
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
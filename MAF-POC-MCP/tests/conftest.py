@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Modules import each other from the project root (e.g. `from tools.checklist_process import ...`).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from common_server.utils.async_pipeline import AsyncStagedPipeline, PipelineStage
+
+
+def _leftover_tasks():
+    return [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+
+def test_failed_items_are_routed_through_on_error_to_the_sink():
+    emitted, errors = [], []
+
+    async def double(x):
+        return x * 2
+
+    async def fragile(x):
+        if x in (6, 10):
+            raise ValueError(f"boom {x}")
+        return x + 1
+
+    def on_error(stage, item, error):
+        errors.append((stage, item, str(error)))
+        return None if item == 10 else {"failed": item}
+
+    pipeline = AsyncStagedPipeline(
+        [PipelineStage("double", double, concurrency=2), PipelineStage("fragile", fragile, concurrency=3)],
+        sink=emitted.append,
+        on_error=on_error,
+    )
+    stats = asyncio.run(pipeline.run(range(8))).to_dict()
+
+    assert sorted(e for e in emitted if isinstance(e, int)) == [1, 3, 5, 9, 13, 15]
+    assert [e for e in emitted if isinstance(e, dict)] == [{"failed": 6}]
+    assert sorted(errors) == [("fragile", 6, "boom 6"), ("fragile", 10, "boom 10")]
+    assert stats["stages"]["fragile"]["failed"] == 2
+    assert stats["stages"]["fragile"]["processed"] == 6
+    assert stats["emitted"] == 7
+
+
+def test_partial_final_batch_is_flushed_at_end_of_input():
+    batches, emitted = [], []
+
+    async def collect(batch):
+        batches.append(list(batch))
+        return batch
+
+    async def run():
+        async def source():
+            for i in range(10):
+                yield i
+
+        pipeline = AsyncStagedPipeline(
+            [PipelineStage("batch", collect, batch_size=4, batch_timeout=30.0, fan_out=True)],
+            sink=emitted.append,
+        )
+        # The last two items must not wait for batch_timeout once the source is exhausted.
+        return await asyncio.wait_for(pipeline.run(source()), timeout=5.0)
+
+    stats = asyncio.run(run()).to_dict()
+
+    assert batches == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+    assert emitted == list(range(10))
+    assert stats["stages"]["batch"]["calls"] == 3
+    assert stats["stages"]["batch"]["forwarded"] == 10
+
+
+def test_stop_reaches_every_worker_and_run_shuts_down_cleanly():
+    emitted = []
+    peak = {"active": 0, "max": 0}
+
+    async def slow(x):
+        peak["active"] += 1
+        peak["max"] = max(peak["max"], peak["active"])
+        await asyncio.sleep(0.001 * (x % 3))
+        peak["active"] -= 1
+        return x
+
+    async def batch(items):
+        await asyncio.sleep(0)
+        return items
+
+    async def run():
+        pipeline = AsyncStagedPipeline(
+            [
+                PipelineStage("slow", slow, concurrency=4, queue_size=2),
+                PipelineStage("batch", batch, concurrency=3, batch_size=5, batch_timeout=0.01, fan_out=True),
+                PipelineStage("tail", slow, concurrency=6, queue_size=1),
+            ],
+            sink=emitted.append,
+        )
+        stats = await asyncio.wait_for(pipeline.run(range(50)), timeout=10.0)
+        return stats, _leftover_tasks()
+
+    stats, leftover = asyncio.run(run())
+
+    assert sorted(emitted) == list(range(50))
+    assert leftover == []
+    assert peak["max"] > 1
+    assert stats.emitted == 50
+
+
+def test_a_failing_sink_cancels_every_stage():
+    async def passthrough(x):
+        await asyncio.sleep(0)
+        return x
+
+    def sink(item):
+        if item == 3:
+            raise RuntimeError("sink down")
+
+    async def run():
+        pipeline = AsyncStagedPipeline(
+            [PipelineStage("a", passthrough, concurrency=3), PipelineStage("b", passthrough, concurrency=2)],
+            sink=sink,
+        )
+        with pytest.raises(RuntimeError, match="sink down"):
+            await asyncio.wait_for(pipeline.run(range(1000)), timeout=5.0)
+        return _leftover_tasks()
+
+    assert asyncio.run(run()) == []
@@ -0,0 +1,120 @@
+import io
+import json
+import asyncio
+
+from models.dto import ChecklistProcessingConfig
+from service.checklist_journal import ChecklistJournal
+from tools.checklist_process import ChecklistProcessor, ChecklistRunContext
+
+
+def _leaf(block_id, title):
+    return {"blockId": block_id, "blockType": "RadioQuestion", "title": title, "responseOptions": ["Yes", "No"]}
+
+
+def _answered(leaf, answer="Yes"):
+    return {
+        **leaf,
+        "fingerprint": ChecklistProcessor.leaf_fingerprint(leaf),
+        "answer": answer,
+        "rationale": f"because {leaf['blockId']}",
+        "status": "processed",
+    }
+
+
+def _run_context(journal):
+    ctx = ChecklistRunContext(
+        request_id="req",
+        rag_retrieval_config=None,
+        search_config=None,
+        embedding_config=None,
+        openai_chat_model_config=None,
+        prompt=None,
+        processing_config=ChecklistProcessingConfig(),
+    )
+    ctx.journal = journal
+    return ctx
+
+
+def test_resume_truncates_partial_last_line(tmp_path):
+    journal = ChecklistJournal("req", directory=str(tmp_path)).open()
+    asyncio.run(journal.append([_answered(_leaf("a", "A?")), _answered(_leaf("b", "B?"))]))
+    valid_size = journal._file.tell()
+    journal.close()
+    with open(journal.path, "ab") as f:
+        f.write(b'{"blockId": "c", "answer": "Y')
+
+    resumed = ChecklistJournal("req", directory=str(tmp_path)).open(resume=True)
+    try:
+        assert len(resumed) == 2 and "c" not in resumed
+        assert resumed._file.tell() == valid_size
+        asyncio.run(resumed.append([_answered(_leaf("c", "C?"), answer="No")]))
+        assert resumed.read("c")["answer"] == "No"
+        assert resumed.read("b")["rationale"] == "because b"
+    finally:
+        resumed.close()
+    with open(resumed.path, "rb") as f:
+        assert [json.loads(line)["blockId"] for line in f] == ["a", "b", "c"]
+
+
+def test_every_append_is_fsynced(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr("service.checklist_journal.os.fsync", synced.append)
+    journal = ChecklistJournal("req", directory=str(tmp_path)).open()
+    try:
+        asyncio.run(journal.append([_answered(_leaf("a", "A?"))]))
+        asyncio.run(journal.append([_answered(_leaf("b", "B?")), _answered(_leaf("c", "C?"))]))
+        asyncio.run(journal.append([{"title": "no block id"}]))
+    finally:
+        journal.close()
+    assert len(synced) == 2
+
+
+def test_resume_skips_journaled_leaves_and_reanswers_changed_ones(tmp_path, monkeypatch):
+    async def no_embeddings(cls, queries, embedding_config):
+        return {}
+    monkeypatch.setattr(ChecklistProcessor, "embed_queries", classmethod(no_embeddings))
+
+    first = ChecklistJournal("req", directory=str(tmp_path)).open()
+    asyncio.run(first.append([_answered(_leaf("a", "A?")), _answered(_leaf("b", "B?"))]))
+    first.close()
+
+    journal = ChecklistJournal("req", directory=str(tmp_path)).open(resume=True)
+    ctx = _run_context(journal)
+    # "b" changed its title since it was journaled, "c" was never answered.
+    groups = [{"leaves": [_leaf("a", "A?"), _leaf("b", "B changed?"), _leaf("c", "C?")]}]
+    try:
+        work_items = asyncio.run(ChecklistProcessor.prepare_block_group_batch(
+            groups, ctx, previous_leaves={}, previous_evidence=None, evidence_fingerprint=None, resume=True
+        ))
+    finally:
+        journal.close()
+
+    assert [leaf["blockId"] for item in work_items for leaf in item.leaves] == ["b", "c"]
+    assert ctx.counters["resumed_leaves"] == 1
+
+
+def test_write_answer_file_merges_journal_in_template_order(tmp_path):
+    leaves = [_leaf("a", "A?"), _leaf("b", "B?"), _leaf("c", "C?")]
+    for leaf in leaves:
+        leaf["fingerprint"] = ChecklistProcessor.leaf_fingerprint(leaf)
+    journal = ChecklistJournal("req", directory=str(tmp_path)).open()
+    try:
+        asyncio.run(journal.append([_answered(leaves[2], answer="No"), _answered(leaves[0])]))
+
+        compact = io.BytesIO()
+        journal.write_answer_file(compact, {"checklistId": "x"}, leaves, evidenceFingerprint="ev")
+        original = io.BytesIO()
+        journal.write_answer_file(original, {"checklistId": "x"}, leaves, compact=False, omit_fields=("fingerprint",))
+    finally:
+        journal.close()
+
+    document = json.loads(compact.getvalue())
+    assert document["evidenceFingerprint"] == "ev"
+    assert [(leaf["blockId"], leaf.get("answer")) for leaf in document["blocks"]] == [("a", "Yes"), ("b", None), ("c", "No")]
+    assert all("fingerprint" in leaf for leaf in document["blocks"])
+
+    # Without the opt-in modes the file matches the original indented layout.
+    expected_blocks = [{k: v for k, v in leaf.items() if k != "fingerprint"} for leaf in document["blocks"]]
+    assert original.getvalue().decode("utf-8") == json.dumps(
+        {"metaData": {"checklistId": "x"}, "blocks": expected_blocks}, indent=2
+    )
@@ -0,0 +1,131 @@
+import os
+import asyncio
+import multiprocessing
+
+import tools.checklist_shard as checklist_shard
+from common_server.ai.rate_limiter import AzureOpenAIRateLimiter
+from models.data_class import ChecklistWorkItem
+from tools.checklist_process import ChecklistProcessor
+from tools.checklist_shard import MAX_SHARD_ATTEMPTS, ChecklistShardCoordinator
+
+MODEL = {
+    "endpoint": "https://aoai.test",
+    "api_key": "key",
+    "model_name": "model",
+    "deployment_name": "chat",
+    "api_version": "2024-08-01-preview",
+}
+CONFIG = {
+    "retrieval_config": {"query": "", "filter": ""},
+    "search_config": {"endpoint": "https://search.test", "api_key": "key", "index_name": "chunks"},
+    "embedding_config": {**MODEL, "model_name": "embedding"},
+    "openai_chat_model_config": MODEL,
+    "prompt": {"system_prompt": "system", "user_prompt": "user"},
+}
+
+
+def _work_items(behaviours):
+    return [
+        ChecklistWorkItem(leaves=[{"blockId": f"q{i}", "title": f"Question {i}", "behaviour": b}], query=f"Question {i}")
+        for i, b in enumerate(behaviours)
+    ]
+
+
+async def _items(work_items):
+    for work in work_items:
+        yield work
+
+
+def _patch_worker(monkeypatch, marker):
+    """Workers answer without Azure: 'die' kills the worker process once, 'fail' always raises."""
+    async def fake_pipeline(cls, work_items, ctx, answer_handler=None):
+        for work in work_items:
+            behaviour = work.leaves[0]["behaviour"]
+            if behaviour == "die" and not os.path.exists(marker):
+                open(marker, "w").close()
+                os._exit(1)
+            if behaviour == "fail":
+                raise RuntimeError("simulated failure")
+            for leaf in work.leaves:
+                leaf["answer"], leaf["status"] = "Yes", "processed"
+            await ctx.on_answered(work)
+
+    monkeypatch.setattr(ChecklistProcessor, "process_in_pipeline", classmethod(fake_pipeline))
+    monkeypatch.setattr(ChecklistProcessor, "load_agent_config", classmethod(lambda cls, config_id=None: (CONFIG, None)))
+
+    # Two forked worker processes (they inherit the fakes above) join the coordinator's local manager.
+    start_server = ChecklistShardCoordinator._start_server
+
+    def start_with_workers(self):
+        address = start_server(self)
+        fork = multiprocessing.get_context("fork")
+        for _ in range(2):
+            process = fork.Process(target=checklist_shard.run_shard_worker, args=(address, self.authkey), daemon=True)
+            process.start()
+            self._processes.append(process)
+        return address
+
+    monkeypatch.setattr(ChecklistShardCoordinator, "_start_server", start_with_workers)
+
+
+def _run(behaviours, shard_size):
+    ctx = ChecklistProcessor.run_context_from_config("req-shard", CONFIG)
+    answered = {}
+
+    async def on_answered(work):
+        answered[work.leaves[0]["blockId"]] = dict(work.leaves[0])
+
+    ctx.on_answered = on_answered
+    coordinator = ChecklistShardCoordinator(
+        ctx, config_id=1, shard_size=shard_size, local_workers=0, shard_timeout=2.0
+    )
+    stats = asyncio.run(coordinator.run(_items(_work_items(behaviours))))
+    return stats, answered
+
+
+def test_shard_of_a_dead_worker_is_requeued(monkeypatch, tmp_path):
+    _patch_worker(monkeypatch, str(tmp_path / "died"))
+
+    stats, answered = _run(["die", "ok", "ok", "ok", "ok", "ok"], shard_size=2)
+
+    assert os.path.exists(tmp_path / "died")
+    assert stats["requeued_shards"] >= 1
+    assert stats["failed_shards"] == 0
+    assert sorted(answered) == [f"q{i}" for i in range(6)]
+    assert all(leaf["answer"] == "Yes" and leaf["status"] == "processed" for leaf in answered.values())
+
+
+def test_failing_shard_gives_up_after_max_attempts(monkeypatch, tmp_path):
+    _patch_worker(monkeypatch, str(tmp_path / "died"))
+
+    stats, answered = _run(["fail", "ok", "ok"], shard_size=1)
+
+    assert stats["shards"] == 3 + MAX_SHARD_ATTEMPTS - 1
+    assert stats["requeued_shards"] == MAX_SHARD_ATTEMPTS - 1
+    assert stats["failed_shards"] == 1
+    assert answered["q0"]["status"] == "error"
+    assert answered["q1"]["answer"] == answered["q2"]["answer"] == "Yes"
+
+
+def test_deployment_budgets_are_split_across_workers(monkeypatch):
+    monkeypatch.setattr(AzureOpenAIRateLimiter, "_limiters", {})
+    AzureOpenAIRateLimiter.configure(MODEL["endpoint"], "chat", tokens_per_minute=300_000, requests_per_minute=1_800, max_concurrency=30)
+    AzureOpenAIRateLimiter.configure(MODEL["endpoint"], "embedding", tokens_per_minute=90_000, requests_per_minute=600, max_concurrency=9)
+    ctx = ChecklistProcessor.run_context_from_config("req-limits", CONFIG)
+
+    coordinator = ChecklistShardCoordinator(ctx, config_id=1, local_workers=2, remote_workers=1)
+
+    limits = {entry["deployment"]: entry for entry in coordinator._rate_limits}
+    assert limits["chat"]["tokens_per_minute"] == 100_000
+    assert limits["chat"]["requests_per_minute"] == 600
+    assert limits["chat"]["max_concurrency"] == 10
+    assert limits["embedding"]["tokens_per_minute"] == 30_000
+
+    # A worker process adopts its share in place of the full AOAI_TPM / AOAI_RPM budget.
+    monkeypatch.setattr(AzureOpenAIRateLimiter, "_limiters", {})
+    monkeypatch.setattr(checklist_shard, "_configured_limits", {})
+    checklist_shard._apply_rate_limits(coordinator._rate_limits)
+    limiter = AzureOpenAIRateLimiter.get(MODEL["endpoint"], "chat")
+    assert limiter.tokens.capacity == 100_000
+    assert limiter.requests.capacity == 600
+    assert limiter.max_concurrency == 10
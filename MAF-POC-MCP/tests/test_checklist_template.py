@@ -0,0 +1,96 @@
+import copy
+import json
+import asyncio
+import os
+
+import pytest
+
+from models.data_class import ChecklistTree
+from tools.checklist_process import parse_block
+from tools.checklist_template_stream import ChecklistTemplateStream
+
+SAMPLE_TEMPLATE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "downloads",
+    "SmithsFRAAccuracyTesting_Checklist_AI.json",
+)
+
+
+class _ChunkedReader:
+    """Serves the template in small, uneven reads to exercise the incremental parser."""
+
+    def __init__(self, data: bytes, chunk: int = 257):
+        self.data = data
+        self.pos = 0
+        self.chunk = chunk
+
+    async def read(self, size: int) -> bytes:
+        piece = self.data[self.pos:self.pos + min(size, self.chunk)]
+        self.pos += len(piece)
+        return piece
+
+
+@pytest.fixture(scope="module")
+def sample_template():
+    """The sample export with every question flagged for AI answering (the export leaves the flag unset)."""
+    with open(SAMPLE_TEMPLATE, encoding="utf-8") as f:
+        template = json.load(f)
+    stack = list(template["blocks"])
+    while stack:
+        block = stack.pop()
+        if block.get("blockType") == "RadioQuestion":
+            block["isAIResponseExpected"] = True
+        stack.extend(block.get("blocks") or [])
+    return template
+
+
+def _walk_leaf_groups(blocks, max_group_size):
+    """Wire groups as produced before the compact tree: Block.walk_leaf_groups over each root."""
+    return [
+        group.to_wire()
+        for block in blocks
+        for group in parse_block(copy.deepcopy(block)).walk_leaf_groups(max_group_size=max_group_size)
+    ]
+
+
+def _stream_groups(template, max_group_size):
+    async def run():
+        stream = ChecklistTemplateStream.from_reader(
+            _ChunkedReader(json.dumps(template).encode("utf-8")), max_group_size=max_group_size
+        )
+        batched = [group async for batch in stream.batches() for group in batch]
+        return stream.ordered_groups(), batched
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("max_group_size", [None, 2])
+def test_tree_and_stream_match_walk_leaf_groups_on_the_sample_template(sample_template, max_group_size):
+    blocks = sample_template["blocks"]
+    expected = _walk_leaf_groups(blocks, max_group_size)
+    assert expected, "the sample template should produce leaf groups"
+
+    assert ChecklistTree.from_blocks(blocks).to_wire_groups(max_group_size=max_group_size) == expected
+
+    ordered, batched = _stream_groups(sample_template, max_group_size)
+    assert ordered == expected
+    assert sorted(g["groupId"] for g in batched) == sorted(g["groupId"] for g in expected)
+
+
+def test_null_guidance_is_emitted_as_empty_string():
+    leaves = [
+        {"blockId": f"q{i}", "blockType": "RadioQuestion", "title": f"Q{i}?", "responseOptions": ["Yes", "No"],
+         "guidanceText": guidance, "isAIResponseExpected": True, "blocks": []}
+        for i, guidance in enumerate([None, "", "IAS 1 (para 10)"])
+    ]
+    blocks = [{"blockId": "s", "blockType": "Section", "title": "S", "guidanceText": None, "blocks": leaves}]
+    expected = _walk_leaf_groups(blocks, None)
+
+    # Block keeps None; the tree and the stream emit "" under the same (empty) group key.
+    assert [leaf["guidanceText"] for group in expected for leaf in group["leaves"]] == [None, "", "IAS 1 (para 10)"]
+    for group in expected:
+        for record in group["leaves"] + group["ancestors"]:
+            if record["guidanceText"] is None:
+                record["guidanceText"] = ""
+
+    assert ChecklistTree.from_blocks(blocks).to_wire_groups() == expected
+    assert _stream_groups({"blocks": blocks}, None)[0] == expected
@@ -0,0 +1,154 @@
+import asyncio
+import threading
+from collections import OrderedDict
+
+import pytest
+
+from service.job_engine import JobEngine
+from service.job_store import SqliteJobStore
+
+
+@pytest.fixture
+def engine(monkeypatch, tmp_path):
+    """A fresh JobEngine (its state is class-wide) over a sqlite store under tmp_path."""
+    for name, value in (
+        ("store", None), ("_handlers", {}), ("_queues", OrderedDict()), ("_running", {}),
+        ("_running_requests", set()), ("_progress", {}), ("_workers", []), ("_wakeup", None),
+    ):
+        monkeypatch.setattr(JobEngine, name, value)
+    store = SqliteJobStore(str(tmp_path / "jobs.sqlite"))
+    yield store
+    store.close()
+
+
+async def _wait_for(predicate, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not await predicate():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached in time"
+        await asyncio.sleep(0.01)
+
+
+def _has_status(job, status):
+    async def check():
+        return (await JobEngine.get(job["job_id"]))["status"] == status
+    return check
+
+
+def test_cancel_queued_and_running_jobs(engine):
+    started, cancelled = [], []
+
+    async def handler(payload, job):
+        started.append(job.job_id)
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.append(job.job_id)
+            raise
+
+    async def scenario():
+        JobEngine.register("wait", handler)
+        await JobEngine.start(store=engine, workers=1)
+        try:
+            running = await JobEngine.submit("wait", "r1", {})
+            queued = await JobEngine.submit("wait", "r2", {})
+            await _wait_for(_has_status(running, "running"))
+
+            assert (await JobEngine.cancel(queued["job_id"]))["status"] == "cancelled"
+            assert (await JobEngine.cancel(running["job_id"]))["status"] == "cancelled"
+            await asyncio.sleep(0.05)
+        finally:
+            await JobEngine.stop()
+        assert started == cancelled == [running["job_id"]]
+
+    asyncio.run(scenario())
+
+
+def test_interrupted_job_is_requeued_on_restart(engine):
+    async def first_process(payload, job):
+        await asyncio.Event().wait()
+
+    async def second_process(payload, job):
+        return {"attempts": job.attempts}
+
+    async def scenario():
+        JobEngine.register("resume", first_process)
+        await JobEngine.start(store=engine, workers=1)
+        job = await JobEngine.submit("resume", "r1", {"request_id": "r1"})
+        await _wait_for(_has_status(job, "running"))
+        # The process goes away mid-job: the store keeps the job 'running'.
+        await JobEngine.stop()
+        assert engine.get(job["job_id"])["status"] == "running"
+
+        JobEngine.register("resume", second_process)
+        await JobEngine.start(store=engine, workers=1)
+        try:
+            await _wait_for(_has_status(job, "succeeded"))
+        finally:
+            await JobEngine.stop()
+        finished = engine.get(job["job_id"])
+        assert finished["attempts"] == 2
+        assert finished["result"] == {"attempts": 2}
+
+    asyncio.run(scenario())
+
+
+def test_jobs_of_one_request_never_run_concurrently(engine):
+    active = {}
+    peak = {}
+    overlap = []
+
+    async def handler(payload, job):
+        active[job.request_id] = active.get(job.request_id, 0) + 1
+        peak[job.request_id] = max(peak.get(job.request_id, 0), active[job.request_id])
+        overlap.append(sum(active.values()))
+        await asyncio.sleep(0.05)
+        active[job.request_id] -= 1
+
+    async def scenario():
+        JobEngine.register("work", handler)
+        await JobEngine.start(store=engine, workers=3)
+        try:
+            jobs = [await JobEngine.submit("work", "r1", {}) for _ in range(3)]
+            jobs.append(await JobEngine.submit("work", "r2", {}))
+
+            for job in jobs:
+                await _wait_for(_has_status(job, "succeeded"))
+        finally:
+            await JobEngine.stop()
+
+    asyncio.run(scenario())
+    assert peak == {"r1": 1, "r2": 1}
+    # Idle workers still pick up other request_ids meanwhile.
+    assert max(overlap) == 2
+
+
+def test_progress_is_persisted_off_the_event_loop(engine, monkeypatch):
+    writers = []
+    update = engine.update
+
+    def recording_update(job_id, **fields):
+        if "progress" in fields:
+            writers.append((threading.get_ident(), fields["progress"]))
+        update(job_id, **fields)
+
+    monkeypatch.setattr(engine, "update", recording_update)
+
+    async def handler(payload, job):
+        job.report({"phase": "answering", "leaves": 1}, force=True)
+        job.report({"phase": "answering", "leaves": 2}, force=True)
+
+    async def scenario():
+        JobEngine.register("progress", handler)
+        await JobEngine.start(store=engine, workers=1)
+        try:
+            job = await JobEngine.submit("progress", "r1", {})
+            await _wait_for(_has_status(job, "succeeded"))
+        finally:
+            await JobEngine.stop()
+        return threading.get_ident(), job
+
+    loop_thread, job = asyncio.run(scenario())
+    reported = [progress for thread, progress in writers if progress is not None]
+    assert reported[:2] == [{"phase": "answering", "leaves": 1}, {"phase": "answering", "leaves": 2}]
+    assert all(thread != loop_thread for thread, _ in writers)
+    assert engine.get(job["job_id"])["progress"] == {"phase": "answering", "leaves": 2}
@@ -0,0 +1,121 @@
+import asyncio
+
+import httpx2
+import pytest
+from openai import RateLimitError
+
+from common_server.ai.rate_limiter import AzureOpenAIRateLimiter, DeploymentRateLimiter, Priority
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _limiter(clock, max_concurrency=8, tokens_per_minute=60_000, requests_per_minute=600):
+    return DeploymentRateLimiter(
+        "gpt-test",
+        tokens_per_minute=tokens_per_minute,
+        requests_per_minute=requests_per_minute,
+        max_concurrency=max_concurrency,
+        clock=clock,
+    )
+
+
+def _throttled(retry_after_ms: str) -> RateLimitError:
+    request = httpx2.Request("POST", "https://aoai.test/chat/completions")
+    response = httpx2.Response(429, headers={"retry-after-ms": retry_after_ms}, request=request)
+    return RateLimitError("rate limited", response=response, body=None)
+
+
+def test_throttle_halves_concurrency_and_success_grows_it_back():
+    clock = FakeClock()
+    limiter = _limiter(clock)
+
+    async def scenario():
+        await limiter.acquire(100)
+        limiter.release(100, used_tokens=80, throttled=True, retry_after=2.0)
+        assert limiter.concurrency_limit == 4
+        assert limiter.paused_until == clock.now + 2.0
+        # The deployment stays paused until Retry-After has passed on the clock.
+        assert limiter._delay(100, clock.now) == pytest.approx(2.0)
+        clock.now += 2.0
+        assert limiter._delay(100, clock.now) == 0
+
+        await limiter.acquire(100)
+        limiter.release(100, used_tokens=100)
+        assert limiter.concurrency_limit == pytest.approx(4.25)
+        for _ in range(100):
+            await limiter.acquire(100)
+            limiter.release(100, used_tokens=100)
+        assert limiter.concurrency_limit == limiter.max_concurrency
+
+    asyncio.run(scenario())
+    assert limiter.stats["throttled"] == 1
+
+
+def test_token_bucket_refills_with_the_clock():
+    clock = FakeClock()
+    limiter = _limiter(clock, tokens_per_minute=600)
+
+    async def scenario():
+        await limiter.acquire(600)
+        limiter.release(600, used_tokens=600)
+        assert limiter._delay(300, clock.now) == pytest.approx(30.0)
+        clock.now += 30.0
+        assert limiter._delay(300, clock.now) == 0
+
+    asyncio.run(scenario())
+
+
+def test_high_priority_waiter_is_admitted_first():
+    clock = FakeClock()
+    limiter = _limiter(clock, max_concurrency=1)
+    admitted = []
+
+    async def caller(name, priority):
+        await limiter.acquire(10, priority)
+        admitted.append(name)
+
+    async def scenario():
+        await limiter.acquire(10)
+        bulk = asyncio.create_task(caller("bulk", Priority.BULK))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(caller("interactive", Priority.INTERACTIVE))
+        await asyncio.sleep(0)
+        assert limiter.snapshot()["queued"] == 2
+
+        limiter.release(10, used_tokens=10)
+        await asyncio.sleep(0)
+        assert admitted == ["interactive"]
+
+        limiter.release(10, used_tokens=10)
+        await asyncio.gather(bulk, interactive)
+        assert admitted == ["interactive", "bulk"]
+
+    asyncio.run(scenario())
+
+
+def test_call_retries_a_429_and_settles_actual_usage(monkeypatch):
+    clock = FakeClock()
+    limiter = _limiter(clock, max_concurrency=4)
+    monkeypatch.setattr(AzureOpenAIRateLimiter, "_limiters", {("https://aoai.test", "gpt-test"): limiter})
+    responses = [_throttled("0"), type("Response", (), {"usage": type("Usage", (), {"total_tokens": 40})})()]
+
+    async def request():
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    result = asyncio.run(AzureOpenAIRateLimiter.call("https://aoai.test", "gpt-test", request, estimated_tokens=100))
+
+    assert result.usage.total_tokens == 40
+    assert limiter.stats == {"granted": 2, "throttled": 1, "waited_seconds": 0.0}
+    assert limiter.concurrency_limit == pytest.approx(2.5)
+    assert limiter.in_flight == 0
+    # The throttled attempt keeps its 100-token reservation; the successful one is settled at 40.
+    assert limiter.tokens.level == limiter.tokens.capacity - 140
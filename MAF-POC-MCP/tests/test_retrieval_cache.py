@@ -0,0 +1,114 @@
+import asyncio
+
+from common_server.cache.retrieval_cache import SemanticRetrievalCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 500.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class CountingSearch:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return [{"id": f"chunk-{self.calls}"}]
+
+
+def test_exact_hit_reuses_the_search_and_filters_are_kept_apart():
+    cache = SemanticRetrievalCache()
+    search = CountingSearch()
+
+    async def scenario():
+        first = await cache.get_or_search("r1", "request_id eq 'r1'", [1.0, 0.0, 0.0], search)
+        again = await cache.get_or_search("r1", "request_id eq 'r1'", [1.0, 0.0, 0.0], search)
+        other_filter = await cache.get_or_search("r1", "source eq 'x'", [1.0, 0.0, 0.0], search)
+        other_request = await cache.get_or_search("r2", "request_id eq 'r1'", [1.0, 0.0, 0.0], search)
+        return first, again, other_filter, other_request
+
+    first, again, other_filter, other_request = asyncio.run(scenario())
+
+    assert again is first
+    assert other_filter != first and other_request != first
+    assert search.calls == 3
+    assert cache.stats()["exact_hits"] == 1
+
+
+def test_semantic_hit_above_the_similarity_threshold_only():
+    cache = SemanticRetrievalCache(similarity_threshold=0.99)
+    search = CountingSearch()
+
+    async def scenario():
+        first = await cache.get_or_search("r1", "f", [1.0, 0.0, 0.0], search)
+        near = await cache.get_or_search("r1", "f", [1.0, 0.01, 0.0], search)
+        far = await cache.get_or_search("r1", "f", [0.0, 1.0, 0.0], search)
+        return first, near, far
+
+    first, near, far = asyncio.run(scenario())
+
+    assert near is first
+    assert far != first
+    assert search.calls == 2
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_entries_expire_after_the_ttl():
+    clock = FakeClock()
+    cache = SemanticRetrievalCache(ttl_seconds=60.0, clock=clock)
+    search = CountingSearch()
+
+    async def scenario():
+        await cache.get_or_search("r1", "f", [0.3, 0.4], search)
+        clock.now += 59.0
+        await cache.get_or_search("r1", "f", [0.3, 0.4], search)
+        assert search.calls == 1
+        clock.now += 2.0
+        return await cache.get_or_search("r1", "f", [0.3, 0.4], search)
+
+    assert asyncio.run(scenario()) == [{"id": "chunk-2"}]
+    assert search.calls == 2
+
+
+def test_invalidate_discards_a_search_already_in_flight():
+    cache = SemanticRetrievalCache()
+    calls = []
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def stale_search():
+            calls.append("stale")
+            await gate.wait()
+            return [{"id": "old-chunk"}]
+
+        async def fresh_search():
+            calls.append("fresh")
+            return [{"id": "new-chunk"}]
+
+        leader = asyncio.create_task(cache.get_or_search("r1", "f", [1.0, 0.0], stale_search))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.get_or_search("r1", "f", [1.0, 0.0], stale_search))
+        await asyncio.sleep(0)
+
+        cache.invalidate("r1")
+        # A caller arriving after the invalidation does not join the stale search.
+        after = await asyncio.wait_for(cache.get_or_search("r1", "f", [1.0, 0.0], fresh_search), timeout=5.0)
+
+        gate.set()
+        stale_results = await asyncio.gather(leader, follower)
+        cached = await cache.get_or_search("r1", "f", [1.0, 0.0], stale_search)
+        return after, stale_results, cached
+
+    after, stale_results, cached = asyncio.run(scenario())
+
+    assert after == [{"id": "new-chunk"}]
+    # Callers already waiting still get their answer...
+    assert stale_results == [[{"id": "old-chunk"}], [{"id": "old-chunk"}]]
+    # ...but it is not stored over the result searched after the invalidation.
+    assert cached == [{"id": "new-chunk"}]
+    assert calls == ["stale", "fresh"]
@@ -0,0 +1,6 @@
+from common_server.cognitive_service.search_service import request_id_filter
+
+
+def test_request_id_filter_escapes_quotes():
+    assert request_id_filter("7407da22-33aa") == "request_id eq '7407da22-33aa'"
+    assert request_id_filter("x' or request_id ne '") == "request_id eq 'x'' or request_id ne '''"
@@ -1,5 +1,6 @@
 from agent_framework import AIFunction
-from tools.checklist_process import  ChecklistProcessor
+from tools.checklist_process import CHECKLIST_JOB, ChecklistProcessor
+from service.job_engine import JobEngine
 from models.tool_call_dto import ChecklistProcessingToolCallDto,ChecklistBlockGroupsToolCallDto
 from agent_logger import LoggedAIFunction
 
@@ -16,9 +17,21 @@ from agent_logger import LoggedAIFunction
 #     input_model=ChecklistProcessingToolCallDto
 # )
 
+async def load_checklist(request_id: str, prompt=None, max_workers=10) -> str:
+    """Queue the checklist run on the job engine, like POST /checklist/load-checklist, and return the job id."""
+    if hasattr(prompt, "model_dump"):
+        prompt = prompt.model_dump()
+    job = await JobEngine.submit(
+        CHECKLIST_JOB,
+        request_id=request_id,
+        payload={"request_id": request_id, "prompt": prompt, "max_workers": max_workers},
+    )
+    return job["job_id"]
+
+
 ChecklistLoadAITool = LoggedAIFunction(
-    func=ChecklistProcessor.process_checklist_in_parallel,
+    func=load_checklist,
     name="ChecklistLoadAITool",
-    description="Load checklist block groups from the specified blob storage configuration",
+    description="Load checklist block groups from the specified blob storage configuration and answer them in a background job; returns the job id",
     input_model=ChecklistProcessingToolCallDto
 )
@@ -0,0 +1,386 @@
+import os
+import json
+import time
+import queue
+import asyncio
+import secrets
+import argparse
+import ipaddress
+import multiprocessing
+from dataclasses import asdict
+from multiprocessing.managers import BaseManager
+from typing import Any, AsyncIterable, Dict, List, Optional, Tuple
+from models.data_class import ChecklistWorkItem
+from common_server.ai.rate_limiter import AzureOpenAIRateLimiter
+from service.config_service import ConfigService
+from tools.checklist_process import ChecklistProcessor, ChecklistRunContext
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# Concurrent shards per worker process, so a worker's pipeline never drains between shards.
+SHARD_SLOTS = 2
+MAX_SHARD_ATTEMPTS = 3
+# Counters owned by the coordinator; worker summaries must not add to them.
+_COORDINATOR_COUNTERS = frozenset(("leaves", "work_items", "completed_leaves"))
+# (endpoint, deployment) -> rate limits this worker process was configured with
+_configured_limits: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+
+# Live in the manager's server process, which each coordinator starts for its own run.
+_SERVED_QUEUES: Dict[str, queue.Queue] = {}
+
+
+def _served_queue(name: str) -> queue.Queue:
+    if name not in _SERVED_QUEUES:
+        _SERVED_QUEUES[name] = queue.Queue()
+    return _SERVED_QUEUES[name]
+
+
+def _task_queue() -> queue.Queue:
+    return _served_queue("tasks")
+
+
+def _result_queue() -> queue.Queue:
+    return _served_queue("results")
+
+
+class _ShardQueueManager(BaseManager):
+    """Serves the coordinator's task and result queues over TCP (authkey-authenticated)."""
+
+
+_ShardQueueManager.register("tasks", callable=_task_queue)
+_ShardQueueManager.register("results", callable=_result_queue)
+
+
+def _parse_address(address: str) -> Tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+# Queue payloads are JSON text: no configuration, credentials or pickled objects of ours cross the wire.
+def _dump(message: Dict[str, Any]) -> str:
+    return json.dumps(message, ensure_ascii=False, default=str)
+
+
+# --------------------------
+# Worker
+# --------------------------
+def _apply_rate_limits(rate_limits: List[Dict[str, Any]]):
+    """Limit this worker to its share of each deployment's budget (see AzureOpenAIRateLimiter.share)."""
+    for limits in rate_limits:
+        key = (limits["endpoint"], limits["deployment"])
+        if _configured_limits.get(key) != limits:
+            AzureOpenAIRateLimiter.configure(**limits)
+            _configured_limits[key] = limits
+
+
+async def _run_shard(task: Dict[str, Any], results):
+    """Answer one shard through the regular pipeline, streaming each finished work item back."""
+    shard_id = task["shard_id"]
+    await asyncio.to_thread(results.put, _dump({"type": "started", "shard_id": shard_id}))
+    _apply_rate_limits(task.get("rate_limits") or [])
+    try:
+        # Credentials come from this host's own configuration; only the config id is sent.
+        config, _ = await asyncio.to_thread(ChecklistProcessor.load_agent_config, task["config_id"])
+        ctx = ChecklistProcessor.run_context_from_config(task["request_id"], config, max_workers=task["max_workers"])
+    except Exception as e:
+        logger.error(f"Shard {shard_id} could not load config {task['config_id']}: {e}", exc_info=True)
+        await asyncio.to_thread(results.put, _dump({"type": "failed", "shard_id": shard_id, "error": str(e)}))
+        return
+    items = [(key, ChecklistWorkItem(**work)) for key, work in task["items"]]
+    keys = {id(work): key for key, work in items}
+
+    async def on_answered(work: ChecklistWorkItem):
+        message = {"type": "answered", "shard_id": shard_id, "key": keys[id(work)], "leaves": work.leaves}
+        await asyncio.to_thread(results.put, _dump(message))
+
+    ctx.on_answered = on_answered
+    try:
+        await ChecklistProcessor.process_in_pipeline([work for _, work in items], ctx)
+    except Exception as e:
+        logger.error(f"Shard {shard_id} failed: {e}", exc_info=True)
+        await asyncio.to_thread(results.put, _dump({"type": "failed", "shard_id": shard_id, "error": str(e)}))
+        return
+    await asyncio.to_thread(results.put, _dump({"type": "done", "shard_id": shard_id, "summary": ctx.summary()}))
+
+
+async def _serve(address: Tuple[str, int], authkey: bytes):
+    manager = _ShardQueueManager(address=address, authkey=authkey)
+    manager.connect()
+    tasks, results = manager.tasks(), manager.results()
+    logger.info(f"Shard worker {os.getpid()} connected to {address[0]}:{address[1]}")
+
+    slots = asyncio.Semaphore(SHARD_SLOTS)
+    running = set()
+    try:
+        while True:
+            await slots.acquire()
+            try:
+                task = await asyncio.to_thread(tasks.get, True, 1.0)
+            except queue.Empty:
+                slots.release()
+                continue
+            except (EOFError, ConnectionError, BrokenPipeError):
+                slots.release()
+                logger.info(f"Coordinator at {address[0]}:{address[1]} went away")
+                break
+            if task is None:
+                break
+            shard = asyncio.create_task(_run_shard(json.loads(task), results))
+            running.add(shard)
+            shard.add_done_callback(lambda t: (running.discard(t), slots.release()))
+    finally:
+        await asyncio.gather(*running, return_exceptions=True)
+
+
+def run_shard_worker(address: Tuple[str, int], authkey: bytes):
+    """Worker process entry point: pull shards from the coordinator until told to stop."""
+    asyncio.run(_serve(address, authkey))
+
+
+# --------------------------
+# Coordinator
+# --------------------------
+class ChecklistShardCoordinator:
+    """
+    Runs a checklist across worker processes, on this machine or others.
+
+    Work items are cut into shards of `shard_size` and put on a task queue
+    served by a multiprocessing manager on `bind_address`. Each worker
+    process runs the regular embed -> search -> answer pipeline for its
+    shards on its own event loop (and GIL) and streams every answered work
+    item back on the result queue, where the coordinator journals and
+    publishes it as a single-process run would. Each deployment's TPM, RPM
+    and concurrency budgets are split evenly across the `local_workers` +
+    `remote_workers` processes, so together they stay within them.
+
+    Shards carry only the request id, the checklist agent config id and the
+    work items, as JSON; each worker reads the configuration (and its API
+    keys) from its own config store, which must hold the same config id.
+
+    The queues listen on localhost by default and `local_workers` processes
+    are spawned here. More can join from other hosts with
+    `python -m tools.checklist_shard --connect HOST:PORT` and the same
+    SHARD_AUTHKEY. The manager connection is authenticated but neither
+    encrypted nor safe to expose (its protocol unpickles what peers send), so
+    keep it bound to localhost and reach it from remote workers through an
+    SSH tunnel or a TLS proxy rather than binding a public address. A shard that
+    fails, or goes `shard_timeout` seconds without sending anything once
+    started (or once taken off the queue, for a worker that dies before
+    reporting it), is re-queued with only its unanswered items, up to
+    MAX_SHARD_ATTEMPTS times; late answers from the first attempt are
+    dropped as duplicates.
+    """
+
+    def __init__(
+        self,
+        ctx: ChecklistRunContext,
+        config_id,
+        shard_size: int = 50,
+        local_workers: int = 4,
+        remote_workers: int = 0,
+        bind_address: str = "127.0.0.1:0",
+        shard_timeout: float = 900.0,
+    ):
+        self.ctx = ctx
+        self.config_id = config_id
+        self.shard_size = max(1, shard_size)
+        self.local_workers = max(0, local_workers)
+        self.remote_workers = max(0, remote_workers)
+        self.bind_address = _parse_address(bind_address)
+        self.shard_timeout = shard_timeout
+        self.authkey = (ConfigService.get("SHARD_AUTHKEY") or secrets.token_hex(16)).encode("utf-8")
+        self._tasks = None
+        self._results = None
+        self._pending: Dict[str, ChecklistWorkItem] = {}
+        # shard_id -> {"keys", "attempt", "last_seen"}; last_seen is None while the shard is still queued
+        self._shards: Dict[str, Dict[str, Any]] = {}
+        self._next_shard = 0
+        self._produced = 0
+        self._processes: List[multiprocessing.Process] = []
+        self._manager: Optional[_ShardQueueManager] = None
+        self._rate_limits = self._worker_rate_limits()
+        self.stats = {"shards": 0, "requeued_shards": 0, "failed_shards": 0}
+
+    def _worker_rate_limits(self) -> List[Dict[str, Any]]:
+        ctx = self.ctx
+        deployments = {
+            (ctx.openai_chat_model_config.endpoint, ctx.openai_chat_model_config.deployment_name),
+            (ctx.embedding_config.endpoint, ctx.embedding_config.model_name),
+        }
+        cascade_config = ctx.processing_config.cascade_chat_model_config
+        if ctx.processing_config.cascade_enabled and cascade_config is not None:
+            deployments.add((cascade_config.endpoint, cascade_config.deployment_name))
+        workers = self.local_workers + self.remote_workers
+        return [AzureOpenAIRateLimiter.share(endpoint, deployment, workers) for endpoint, deployment in sorted(deployments)]
+
+    def _start_server(self) -> Tuple[str, int]:
+        # Each run gets its own manager process, so concurrent runs never share queues.
+        self._manager = _ShardQueueManager(
+            address=self.bind_address, authkey=self.authkey, ctx=multiprocessing.get_context("spawn")
+        )
+        self._manager.start()
+        self._tasks, self._results = self._manager.tasks(), self._manager.results()
+        return self._manager.address
+
+    def _stop_server(self):
+        if self._manager is None:
+            return
+        self._tasks = self._results = None
+        self._manager.shutdown()
+        self._manager = None
+
+    async def _put_shard(self, keys: List[str], attempt: int = 1):
+        shard_id = f"{self.ctx.request_id}:{self._next_shard}"
+        self._next_shard += 1
+        self._shards[shard_id] = {"keys": keys, "attempt": attempt, "last_seen": None}
+        await asyncio.to_thread(self._tasks.put, _dump({
+            "shard_id": shard_id,
+            "request_id": self.ctx.request_id,
+            "config_id": self.config_id,
+            "max_workers": self.ctx.max_workers,
+            "rate_limits": self._rate_limits,
+            "items": [(key, asdict(self._pending[key])) for key in keys],
+        }))
+        self.stats["shards"] += 1
+
+    async def _produce(self, work_items: AsyncIterable[ChecklistWorkItem]):
+        chunk: List[str] = []
+        async for work in work_items:
+            self.ctx.count("leaves", len(work.leaves))
+            self.ctx.count("work_items")
+            # Ship the pre-computed query vector so workers skip the embedding call.
+            work.query_vector = work.query_vector or self.ctx.query_vectors.get(work.query)
+            key = f"w{self._produced}"
+            self._produced += 1
+            self._pending[key] = work
+            chunk.append(key)
+            if len(chunk) >= self.shard_size:
+                await self._put_shard(chunk)
+                chunk = []
+        if chunk:
+            await self._put_shard(chunk)
+
+    async def _fail(self, keys: List[str], reason: str):
+        for key in keys:
+            work = self._pending.pop(key, None)
+            if work is None:
+                continue
+            logger.error(f"Giving up on {work.label}: {reason}")
+            self.ctx.count("failed_leaves", len(work.leaves))
+            for leaf in work.leaves:
+                leaf["status"] = "error"
+            await ChecklistProcessor.emit_answered(work, self.ctx)
+
+    async def _retry(self, shard_id: str, reason: str):
+        shard = self._shards.pop(shard_id)
+        keys, attempt = shard["keys"], shard["attempt"]
+        remaining = [key for key in keys if key in self._pending]
+        if not remaining:
+            return
+        if attempt >= MAX_SHARD_ATTEMPTS:
+            self.stats["failed_shards"] += 1
+            await self._fail(remaining, reason)
+            return
+        logger.warning(f"Re-queuing {len(remaining)} items of shard {shard_id} (attempt {attempt + 1}): {reason}")
+        self.stats["requeued_shards"] += 1
+        await self._put_shard(remaining, attempt + 1)
+
+    def _merge_summary(self, summary: Dict[str, Any]):
+        for name, value in summary.items():
+            if isinstance(value, int) and not isinstance(value, bool) and name not in _COORDINATOR_COUNTERS:
+                self.ctx.count(name, value)
+        for tier, stats in (summary.get("tiers") or {}).items():
+            merged = self.ctx.tiers.setdefault(tier, {"calls": 0, "leaves": 0, "seconds": 0.0})
+            for name in merged:
+                merged[name] += stats.get(name, 0)
+
+    async def _handle(self, message: Dict[str, Any]):
+        shard_id = message["shard_id"]
+        if shard_id in self._shards:
+            self._shards[shard_id]["last_seen"] = time.monotonic()
+        if message["type"] == "answered":
+            work = self._pending.pop(message["key"], None)
+            if work is None:
+                return  # duplicate from a shard that was re-queued
+            work.leaves = message["leaves"]
+            await ChecklistProcessor.emit_answered(work, self.ctx)
+        elif message["type"] == "done":
+            self._merge_summary(message.get("summary") or {})
+            if shard_id in self._shards:
+                await self._retry(shard_id, "shard finished without answering every item")
+        elif message["type"] == "failed" and shard_id in self._shards:
+            await self._retry(shard_id, message.get("error") or "worker error")
+
+    async def run(self, work_items: AsyncIterable[ChecklistWorkItem]) -> Dict[str, Any]:
+        """Shard, dispatch and merge `work_items`; returns the sharding statistics."""
+        if not _is_loopback(self.bind_address[0]):
+            logger.warning(
+                f"Shard queues bound to {self.bind_address[0]}: the connection is not encrypted; "
+                f"prefer localhost with an SSH tunnel or TLS proxy for remote workers"
+            )
+        address = await asyncio.to_thread(self._start_server)
+        logger.info(f"Shard coordinator for request_id={self.ctx.request_id} listening on {address[0]}:{address[1]}")
+        spawn = multiprocessing.get_context("spawn")
+        for _ in range(self.local_workers):
+            process = spawn.Process(target=run_shard_worker, args=(address, self.authkey), daemon=True)
+            process.start()
+            self._processes.append(process)
+
+        producer = asyncio.create_task(self._produce(work_items))
+        local_only = _is_loopback(self.bind_address[0])
+        try:
+            while not producer.done() or self._pending:
+                try:
+                    message = await asyncio.to_thread(self._results.get, True, 1.0)
+                except queue.Empty:
+                    message = None
+                if message is not None:
+                    await self._handle(json.loads(message))
+                    continue
+                if producer.done() and producer.exception() is not None:
+                    raise producer.exception()
+                now = time.monotonic()
+                # Queued shards just wait. Once the task queue is empty every shard has been taken,
+                # so one that never started (its worker died holding it) gets a timeout clock too.
+                queue_empty = await asyncio.to_thread(self._tasks.empty)
+                for shard_id, shard in list(self._shards.items()):
+                    if shard["last_seen"] is None and queue_empty:
+                        shard["last_seen"] = now
+                    if shard["last_seen"] is not None and now - shard["last_seen"] > self.shard_timeout:
+                        await self._retry(shard_id, f"no result for {self.shard_timeout:.0f}s")
+                if local_only and self._processes and not any(p.is_alive() for p in self._processes):
+                    raise RuntimeError("All shard worker processes exited")
+            await producer
+        finally:
+            producer.cancel()
+            for _ in self._processes:
+                await asyncio.to_thread(self._tasks.put, None)
+            for process in self._processes:
+                await asyncio.to_thread(process.join, 30)
+                if process.is_alive():
+                    process.terminate()
+            await asyncio.to_thread(self._stop_server)
+
+        logger.info(f"Sharded run finished for request_id={self.ctx.request_id}: {self.stats}")
+        return dict(self.stats)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Join a sharded checklist run as a worker.")
+    parser.add_argument("--connect", required=True, help="HOST:PORT of the shard coordinator")
+    args = parser.parse_args()
+    authkey = ConfigService.get("SHARD_AUTHKEY")
+    if not authkey:
+        parser.error("SHARD_AUTHKEY must be set to the coordinator's key")
+    run_shard_worker(_parse_address(args.connect), authkey.encode("utf-8"))
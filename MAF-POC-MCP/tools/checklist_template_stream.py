@@ -0,0 +1,183 @@
+import ijson
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from models.data_class import Block, sibling_group_id
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+_SCALAR_EVENTS = frozenset(("string", "number", "boolean", "null"))
+_META_KEYS = ("metaData", "metadata")
+
+
+class _Frame:
+    """Parse state of one open block: its scalar fields and pending leaf groups."""
+    __slots__ = ("prefix", "field_prefix", "options_prefix", "child_prefix", "index", "parent",
+                 "fields", "options", "groups", "wire")
+
+    def __init__(self, prefix: str, index: int, parent: Optional["_Frame"]):
+        self.prefix = prefix
+        self.field_prefix = prefix + "."
+        self.options_prefix = prefix + ".responseOptions.item"
+        self.child_prefix = prefix + ".blocks.item"
+        self.index = index
+        self.parent = parent
+        self.fields: Dict[str, Any] = {}
+        self.options: List[Any] = []
+        # guidance key -> [(pre-order index, leaf wire)], in first-seen order
+        self.groups: Dict[Optional[str], List[Tuple[int, Dict[str, Any]]]] = {}
+        self.wire: Optional[Dict[str, Any]] = None
+
+    @property
+    def block_id(self) -> Optional[str]:
+        return self.fields.get("blockId")
+
+    def to_wire(self) -> Dict[str, Any]:
+        """Block.to_wire() layout without children (a null guidanceText becomes "", as in ChecklistTree)."""
+        parent_block_id = self.fields.get("parentBlockId")
+        if parent_block_id is None and self.parent is not None:
+            parent_block_id = self.parent.block_id
+        return {
+            "blockId": self.block_id,
+            "blockType": self.fields.get("blockType"),
+            "title": self.fields.get("title", ""),
+            "responseOptions": list(self.options),
+            "guidanceText": self.fields.get("guidanceText", "") or "",
+            "blocks": [],
+            "parentBlockId": parent_block_id,
+        }
+
+    def shared_wire(self) -> Dict[str, Any]:
+        if self.wire is None:
+            self.wire = self.to_wire()
+        return self.wire
+
+
+class ChecklistTemplateStream:
+    """
+    Incremental checklist template parser built on ijson events.
+
+    Consumes the template as an async byte stream and yields batches of wire
+    leaf groups (same layout, keys and ids as ChecklistTree.to_wire_groups)
+    as soon as every block at `emit_depth` or above closes, i.e. per
+    section, so answering can start while the template is still
+    downloading. Only open blocks and finished groups are held in memory.
+
+    Block scalar fields (blockId, title, ...) are expected before the
+    block's "blocks" array, as the template exporter writes them.
+    """
+
+    def __init__(
+        self,
+        max_group_size: Optional[int] = None,
+        emit_depth: int = 1,
+        on_complete: Optional[Callable[["ChecklistTemplateStream"], Any]] = None,
+    ):
+        self.max_group_size = max_group_size if (isinstance(max_group_size, int) and max_group_size > 0) else None
+        self.emit_depth = emit_depth
+        self.on_complete = on_complete
+        self.meta: Dict[str, Any] = {}
+        self.completed = False
+        self._groups: List[Tuple[Tuple[int, int], Dict[str, Any]]] = []
+        self._source: Optional[AsyncIterable[bytes]] = None
+        self._preloaded: Optional[List[Dict[str, Any]]] = None
+
+    @classmethod
+    def from_reader(cls, reader, **kwargs) -> "ChecklistTemplateStream":
+        """Parse from an async file-like object with `read(size)` (see AsyncChunkReader)."""
+        stream = cls(**kwargs)
+        stream._source = reader
+        return stream
+
+    @classmethod
+    def from_compiled(cls, meta: Any, groups: List[Dict[str, Any]]) -> "ChecklistTemplateStream":
+        """Wrap an already compiled template; `batches()` yields it as a single batch."""
+        stream = cls()
+        stream.meta = meta
+        stream._preloaded = groups
+        return stream
+
+    async def batches(self) -> AsyncIterator[List[Dict[str, Any]]]:
+        if self._preloaded is not None:
+            self.completed = True
+            if self._preloaded:
+                yield self._preloaded
+            return
+
+        pending: List[Dict[str, Any]] = []
+        stack: List[_Frame] = []
+        index = 0
+        meta_builder: Optional[ijson.ObjectBuilder] = None
+
+        async for prefix, event, value in ijson.parse_async(self._source, use_float=True):
+            if meta_builder is not None or (prefix in _META_KEYS and event == "start_map" and not stack):
+                if meta_builder is None:
+                    meta_builder = ijson.ObjectBuilder()
+                meta_builder.event(event, value)
+                if event == "end_map" and prefix in _META_KEYS:
+                    self.meta = meta_builder.value
+                    meta_builder = None
+                continue
+
+            top = stack[-1] if stack else None
+            if event == "start_map" and prefix == (top.child_prefix if top else "blocks.item"):
+                stack.append(_Frame(prefix, index, top))
+                index += 1
+            elif top is None:
+                continue
+            elif event == "end_map" and prefix == top.prefix:
+                stack.pop()
+                self._close(top, stack, pending)
+                if pending and len(stack) <= self.emit_depth:
+                    yield pending
+                    pending = []
+            elif event in _SCALAR_EVENTS:
+                if prefix == top.options_prefix:
+                    top.options.append(value)
+                elif prefix.startswith(top.field_prefix) and "." not in prefix[len(top.field_prefix):]:
+                    top.fields[prefix[len(top.field_prefix):]] = value
+
+        if pending:
+            yield pending
+        self.completed = True
+        logger.info(f"Streamed checklist template: {index} blocks, {len(self._groups)} leaf groups")
+        if self.on_complete is not None:
+            result = self.on_complete(self)
+            if hasattr(result, "__await__"):
+                await result
+
+    def _close(self, frame: _Frame, stack: List[_Frame], pending: List[Dict[str, Any]]):
+        root_id = stack[0].block_id if stack else frame.block_id
+        if frame.fields.get("isAIResponseExpected", False):
+            leaf = (frame.index, frame.to_wire())
+            guidance_key = Block._guidance_group_key(leaf[1]["guidanceText"])
+            if frame.parent is not None:
+                frame.parent.groups.setdefault(guidance_key, []).append(leaf)
+            else:
+                # A root-level leaf forms its own group with no ancestors.
+                self._emit(pending, root_id, None, [], guidance_key, [leaf])
+
+        if frame.groups:
+            ancestors = [f.shared_wire() for f in stack] + [frame.shared_wire()]
+            for guidance_key, leaves in frame.groups.items():
+                self._emit(pending, root_id, frame.block_id, ancestors, guidance_key, leaves)
+            frame.groups = {}
+
+    def _emit(self, pending, root_id, parent_key, ancestors, guidance_key, leaves):
+        group_key = guidance_key or ""
+        limit = self.max_group_size
+        chunks = [leaves] if not limit else [leaves[i : i + limit] for i in range(0, len(leaves), limit)]
+        for chunk_idx, chunk in enumerate(chunks):
+            group = {
+                "groupId": sibling_group_id(root_id, parent_key, group_key, chunk_idx),
+                "groupKey": group_key,
+                "ancestors": ancestors,
+                "leaves": [wire for _, wire in chunk],
+            }
+            self._groups.append(((leaves[0][0], chunk_idx), group))
+            pending.append(group)
+
+    def ordered_groups(self) -> List[Dict[str, Any]]:
+        """All groups in template (DFS) order, matching a non-streamed compile."""
+        if self._preloaded is not None:
+            return self._preloaded
+        return [group for _, group in sorted(self._groups, key=lambda item: item[0])]
@@ -2,7 +2,7 @@
 from typing import Dict, Any
 from beartype import beartype
 from pydantic import UUID4
-from common_server.db.cosmos import CosmosDBStorage
+from service.client_registry import AzureClientRegistry
 from common_server.schemas.cosmos import CosmosConfigDto
 
 class CosmosChunkRetrievalTool:
@@ -11,12 +11,7 @@ class CosmosChunkRetrievalTool:
     @beartype
     async def fetch_chunks(cls, cosmos_config: CosmosConfigDto, request_id: str) -> Dict[str, Any]:
         if cosmos_config:
-            cosmos = CosmosDBStorage(
-                endpoint=cosmos_config.endpoint,
-                key=cosmos_config.key,
-                database_name=cosmos_config.database_name,
-                container_name=cosmos_config.container_name,
-            )
+            cosmos = AzureClientRegistry.get_cosmos_storage(cosmos_config)
             # logger.info(f"Fetching chunks from Cosmos DB for request_id={request_id_uuid}")
             return cosmos.get_chunks_by_request_id(request_id)
         else:
@@ -10,7 +10,7 @@ from fastapi import File
 from logger import setup_logger
 from azure.storage.blob import BlobClient
 from urllib.parse import urlparse, unquote
-from common_server.storage.blob import AzureBlobStorageManager
+from service.client_registry import AzureClientRegistry
 from models.checklist_request import BlobConfig, DocumentAnalysisConfig
 from constants.enums import AuditFileType
 from utils.config_utils import read_config, ChecklistEnum, get_max_id_by_name
@@ -38,9 +38,9 @@ class RagExtractionTool:
         blob_config = config.get("blob_config")
         document_analysis_config = config.get("document_analysis_config")
         
-        blob_config:BlobConfig = BlobConfig.model_validate(blob_config)
-        document_analysis_config:DocumentAnalysisConfig = DocumentAnalysisConfig.model_validate(document_analysis_config)
-        source_blob_manager = AzureBlobStorageManager(
+        blob_config:BlobConfig = AzureClientRegistry.validate(BlobConfig, blob_config)
+        document_analysis_config:DocumentAnalysisConfig = AzureClientRegistry.validate(DocumentAnalysisConfig, document_analysis_config)
+        source_blob_manager = AzureClientRegistry.get_blob_manager(
             endpoint=blob_config.endpoint,
             api_key=blob_config.api_key,
             container_name=blob_config.source_blob_container,
@@ -122,7 +122,6 @@ class RagExtractionTool:
             content_type="application/json"
         )
         logger.info("Uploaded to blob successfully")
-        await source_blob_manager.close()
         
         return {"request_id": request_id, "message": "PDF extraction completed successfully.", "file_name": filename}
         
\ No newline at end of file
@@ -2,10 +2,11 @@ import asyncio
 from math import ceil
 from datetime import datetime
 from beartype import beartype
-from typing import List
-from common_server.cognitive_service.search_service import ChunkIndexer
+from typing import List, Optional
+from service.client_registry import AzureClientRegistry
 from common_server.schemas.cognitive_service import ChunkModel
 from models.checklist_request import SearchConfig
+from models.dto import EmbeddingModelConfig
 
 BATCH_SIZE = 100
 
@@ -17,10 +18,9 @@ class IndexChunksTool:
         cls,
         search_config: SearchConfig,
         request_id: str,
-        extracted_chunks: List[dict]
+        extracted_chunks: List[dict],
+        embedding_config: Optional[EmbeddingModelConfig] = None
     ):
-        indexer = ChunkIndexer(search_config=search_config)
-
         # Convert dicts → ChunkModel objects
         chunks = [
             ChunkModel(
@@ -31,6 +31,12 @@ class IndexChunksTool:
             for chunk in extracted_chunks
         ]
 
+        # The index's vector field must match the embeddings; without a config, size it from the chunks.
+        embedding_dim = embedding_config.dimensions if embedding_config is not None else None
+        if embedding_dim is None and chunks:
+            embedding_dim = len(chunks[0].embeddings)
+        indexer = AzureClientRegistry.get_chunk_indexer(search_config, embedding_dim)
+
         total = len(chunks)
         batches = [
             chunks[i : i + BATCH_SIZE] for i in range(0, total, BATCH_SIZE)
@@ -85,4 +91,27 @@ class IndexChunksTool:
             retry_results = await asyncio.gather(*retry_tasks, return_exceptions=True)
             print("✅ Retry attempt finished.")
 
-        return final_report
\ No newline at end of file
+        return final_report
+
+    @classmethod
+    async def index_batch(
+        cls,
+        indexer,
+        request_id: str,
+        extracted_chunks: List[dict],
+        retries: int = 1
+    ) -> dict:
+        """Index one batch of embedded chunks, retrying a failed upload `retries` times."""
+        created_at = datetime.utcnow().isoformat()
+        chunks = [
+            ChunkModel(**chunk, created_at=created_at, request_id=request_id)
+            for chunk in extracted_chunks
+        ]
+        for attempt in range(retries + 1):
+            try:
+                return await indexer.index_chunks(chunks=chunks, request_id=request_id)
+            except Exception as e:
+                if attempt >= retries:
+                    print(f"❌ Indexing {len(chunks)} chunks failed: {e}")
+                    return {"status": "failed", "indexed": 0, "failed": len(chunks), "error": str(e)}
+                print(f"🔁 Retrying batch of {len(chunks)} chunks after error: {e}")
\ No newline at end of file
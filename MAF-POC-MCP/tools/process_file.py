@@ -1,5 +1,5 @@
 from models.tool_call_dto import BlobConfig
-from common_server.storage.blob import AzureBlobStorageManager
+from service.client_registry import AzureClientRegistry
 from typing import Optional
 from constants.enums import AuditFileType
 from models.checklist_request import SourceFileDto
@@ -14,8 +14,8 @@ class ProcessInputFile:
         file_content: bytes,
         mime_type: Optional[str] = None
     ):
-        blob_config:BlobConfig = BlobConfig.model_validate(blob_config)
-        source_blob_manager = AzureBlobStorageManager(
+        blob_config:BlobConfig = AzureClientRegistry.validate(BlobConfig, blob_config)
+        source_blob_manager = AzureClientRegistry.get_blob_manager(
             endpoint=blob_config.endpoint,
             api_key=blob_config.api_key,
             container_name=blob_config.source_blob_container
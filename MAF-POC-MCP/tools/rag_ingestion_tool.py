@@ -1,17 +1,22 @@
 
-from ijson import common,basic_parse,parse,items
-from common_server.cognitive_service.search_service import ChunkIndexer
+import json
+import asyncio
+import hashlib
+import ijson
 
 from models.checklist_request import BlobConfig
-from models.dto import EmbeddingModelConfig, RagRetrievalConfig, SearchConfigDto
+from models.dto import EmbeddingModelConfig, IngestionPipelineConfig, RagRetrievalConfig, SearchConfigDto
 from utils.config_utils import read_config, ChecklistEnum, get_max_id_by_name
 
 from tools.indexing_tool import IndexChunksTool
 from common_server.utils.text_chunker import TextChunker
-from common_server.utils.embedding import AzureEmbeddingService
+from common_server.storage.async_reader import AsyncChunkReader
+from common_server.cache.embedding_cache import EmbeddingCache
+from common_server.utils.async_pipeline import AsyncStagedPipeline, PipelineStage
+from common_server.cognitive_service.search_service import request_id_filter
 from logger import get_logger
 
-from common_server.storage.blob import AzureBlobStorageManager
+from service.client_registry import AzureClientRegistry
 
 logger = get_logger(__name__)
 
@@ -44,69 +49,146 @@ class RagIngestionTool:
         search_config = config.get("search_config")
         embedding_config = config.get("embedding_config")
         
-        blob_config:BlobConfig = BlobConfig.model_validate(blob_config)
-        search_config:SearchConfigDto = SearchConfigDto.model_validate(search_config)
-        embedding_config: EmbeddingModelConfig = EmbeddingModelConfig.model_validate(embedding_config)
+        blob_config:BlobConfig = AzureClientRegistry.validate(BlobConfig, blob_config)
+        search_config:SearchConfigDto = AzureClientRegistry.validate(SearchConfigDto, search_config)
+        embedding_config: EmbeddingModelConfig = AzureClientRegistry.validate(EmbeddingModelConfig, embedding_config)
+        ingestion_config: IngestionPipelineConfig = AzureClientRegistry.validate(
+            IngestionPipelineConfig, config.get("ingestion_config") or {}
+        )
 
-    
-        # Initialize blob reader
         logger.info(f"🚀 Starting RAG ingestion for request id {request_id}")
 
-        extracted_items = []
-        async for item in cls.stream_json_items_from_blob(blob_config=blob_config, request_id=request_id):
-            extracted_items.append(item)
-        extracted_items = extracted_items[:30]
-        logger.info(f"📄 Retrieved {len(extracted_items)} pages from blob")
-        
-        # Convert paragraphs into flat text content for chunking
-        
-
-        logger.info(f"🧩 Extracted {len(extracted_items)} text entries from blob content")
-
-        # Split content into manageable text chunks
-        chunks = TextChunker(max_tokens=500).chunk_documents(extracted_items)
-        logger.info(f"✂️ Chunked into {len(chunks)} total chunks")
-
-        # Initialize embedding service
-        embedding_service = AzureEmbeddingService(
-            api_key=embedding_config.api_key,
-            endpoint=embedding_config.endpoint,
-            deployment_name=embedding_config.model_name
+        chunker = TextChunker(max_tokens=ingestion_config.chunk_max_tokens)
+        embedding_service = AzureClientRegistry.get_embedding_service(embedding_config)
+        indexer = AzureClientRegistry.get_chunk_indexer(search_config, embedding_config.dimensions)
+        embedding_cache = (
+            EmbeddingCache.open(ingestion_config.embedding_cache_path, ingestion_config.embedding_cache_max_mb * 1024 * 1024)
+            if ingestion_config.embedding_cache_enabled
+            else None
+        )
+        embedding_model, embedding_dimensions = embedding_config.model_name, embedding_config.dimensions or 0
+        totals = {"indexed": 0, "failed": 0, "unchanged": 0, "deleted": 0, "embedding_cache_hits": 0}
+
+        # Incremental mode: chunks whose id is already indexed are skipped, and
+        # whatever is indexed but no longer produced is deleted at the end.
+        existing_ids, current_ids = set(), set()
+        if ingestion_config.incremental:
+            existing_ids = set(await indexer.list_chunk_ids(request_id_filter(request_id)))
+            logger.info(f"🔎 {len(existing_ids)} chunks already indexed for request id {request_id}")
+
+        async def chunk(item: dict) -> list:
+            # Tokenizing is CPU-bound; keep it off the event loop.
+            chunks = await asyncio.to_thread(chunker.chunk_documents, [item])
+            fresh = []
+            for chunk in chunks:
+                chunk["id"] = cls.chunk_id(request_id, chunk)
+                current_ids.add(chunk["id"])
+                if chunk["id"] in existing_ids:
+                    totals["unchanged"] += 1
+                else:
+                    fresh.append(chunk)
+            return fresh
+
+        async def embed(chunks: list) -> list:
+            texts = [chunk["text"] for chunk in chunks]
+            embeddings = (
+                await embedding_cache.aget_vectors(embedding_model, embedding_dimensions, texts)
+                if embedding_cache is not None
+                else [None] * len(texts)
+            )
+            missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+            totals["embedding_cache_hits"] += len(texts) - len(missing)
+            if missing:
+                created = await embedding_service.create_embeddings([texts[i] for i in missing])
+                for i, embedding in zip(missing, created):
+                    embeddings[i] = embedding
+                if embedding_cache is not None:
+                    await embedding_cache.aput_vectors(embedding_model, embedding_dimensions, [texts[i] for i in missing], created)
+            for chunk, embedding in zip(chunks, embeddings):
+                chunk["embeddings"] = embedding
+            return chunks
+
+        async def index(chunks: list) -> dict:
+            return await IndexChunksTool.index_batch(indexer, request_id=request_id, extracted_chunks=chunks)
+
+        def record(result: dict):
+            totals["indexed"] += result.get("indexed", 0)
+            totals["failed"] += result.get("failed", 0)
+
+        # parse (source) -> chunk -> embed -> index; bounded queues keep memory flat
+        # and partial batches flush after batch_timeout_seconds, so indexing starts
+        # as soon as the first pages are parsed.
+        pipeline = AsyncStagedPipeline(
+            stages=[
+                PipelineStage(
+                    "chunk", chunk,
+                    concurrency=ingestion_config.chunk_concurrency,
+                    queue_size=ingestion_config.queue_size,
+                    fan_out=True,
+                ),
+                PipelineStage(
+                    "embed", embed,
+                    concurrency=ingestion_config.embedding_concurrency,
+                    queue_size=ingestion_config.queue_size,
+                    batch_size=ingestion_config.embedding_batch_size,
+                    batch_timeout=ingestion_config.batch_timeout_seconds,
+                    fan_out=True,
+                ),
+                PipelineStage(
+                    "index", index,
+                    concurrency=ingestion_config.index_concurrency,
+                    queue_size=ingestion_config.queue_size,
+                    batch_size=ingestion_config.index_batch_size,
+                    batch_timeout=ingestion_config.batch_timeout_seconds,
+                ),
+            ],
+            sink=record,
+        )
+        stats = await pipeline.run(cls.stream_json_items_from_blob(blob_config=blob_config, request_id=request_id))
+        stats = stats.to_dict()
+        failed = totals["failed"] + stats["stages"]["embed"]["failed"]
+
+        stale_ids = sorted(existing_ids - current_ids)
+        if stale_ids and stats["stages"]["chunk"]["failed"]:
+            # Chunk ids of failed paragraphs are unknown; keep their old chunks.
+            logger.warning(f"⚠️ Skipped deleting {len(stale_ids)} stale chunks because chunking failed for some paragraphs")
+        elif stale_ids:
+            totals["deleted"] = await indexer.delete_chunks(stale_ids, request_id=request_id)
+        logger.info(
+            f"📦 Indexed {totals['indexed']} chunks ({failed} failed, {totals['unchanged']} unchanged, "
+            f"{totals['deleted']} deleted, {totals['embedding_cache_hits']} embedding cache hits): {stats}"
         )
 
-        # Generate embeddings in batches
-        texts = [chunk["text"] for chunk in chunks]
-        embeddings = await embedding_service.create_embeddings(texts)
-        logger.info("🚀 Created embeddings for all chunks")
-        for i, chunk in enumerate(chunks):
-            chunk["embeddings"] = embeddings[i]
-
-        logger.info("✅ Embeddings successfully created for all chunks")
+        return {
+            "request_id": request_id,
+            "message": "successfully ingested and indexed data" if not failed else f"ingested with {failed} chunks failing",
+            **totals,
+            "failed": failed,
+            "stats": stats,
+        }
 
-        # Index chunks into search service
-        await IndexChunksTool.index_chunks(
-            search_config=search_config,
-            extracted_chunks=chunks,
-            request_id=request_id
+    @staticmethod
+    def chunk_id(request_id: str, chunk: dict) -> str:
+        """
+        Deterministic search-index id of a chunk: the same text at the same
+        position of the same request always maps to the same document.
+        """
+        payload = json.dumps(
+            [request_id, chunk.get("page_number"), chunk.get("paragraph_number"), chunk.get("chunk_index"), chunk["text"]],
+            ensure_ascii=False,
         )
-
-        logger.info("📦 Successfully indexed all chunks into search index")
-        return {"request_id": request_id, "message": "successfully ingested and indexed data"}
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
     @classmethod
     async def rag_retrieval(cls, rag_retrieval_config: dict, search_config: dict, embedding_config: dict, request_id: str):
         """Placeholder for RAG retrieval tool."""
         
         rag_retrieval_config: RagRetrievalConfig = RagRetrievalConfig.model_validate(rag_retrieval_config)
-        search_config: SearchConfigDto = SearchConfigDto.model_validate(search_config)
-        embedding_config: EmbeddingModelConfig = EmbeddingModelConfig.model_validate(embedding_config)
-        embedding_service = AzureEmbeddingService(
-            api_key=embedding_config.api_key,
-            endpoint=embedding_config.endpoint,
-            deployment_name=embedding_config.model_name
-        )
+        search_config: SearchConfigDto = AzureClientRegistry.validate(SearchConfigDto, search_config)
+        embedding_config: EmbeddingModelConfig = AzureClientRegistry.validate(EmbeddingModelConfig, embedding_config)
+        embedding_service = AzureClientRegistry.get_embedding_service(embedding_config)
         query_embedding = await embedding_service.get_embedding(text=rag_retrieval_config.query)
-        search_service = ChunkIndexer(search_config=search_config)
+        search_service = AzureClientRegistry.get_chunk_indexer(search_config, embedding_config.dimensions)
         
         results = await search_service.search_similar_docs(query_vector=query_embedding, rag_retrieval_config=rag_retrieval_config)
         return results
@@ -116,11 +198,12 @@ class RagIngestionTool:
         """
         Stream a large JSON file from Azure Blob Storage and yield each paragraph
         along with its corresponding page_number.
-        Handles arbitrarily large files efficiently.
+        Pages are parsed incrementally as chunks download, so memory stays
+        bounded by one chunk plus one page and parsing is linear in file size.
         """
 
         try:
-            azure_blob_storage_instance = AzureBlobStorageManager(
+            azure_blob_storage_instance = AzureClientRegistry.get_blob_manager(
                 api_key=blob_config.api_key,
                 endpoint=blob_config.endpoint,
                 container_name=blob_config.source_blob_container,
@@ -128,33 +211,20 @@ class RagIngestionTool:
 
             blob_name = f"{request_id}.json"
             logger.info(f"📥 Reading blob {blob_name} from container {blob_config.source_blob_container}")
-            blob_stream = await azure_blob_storage_instance.read_blob_content(blob_name=blob_name)
-
-            buffer = b""
-
-            async for chunk in blob_stream.chunks():
-                buffer += chunk
-                try:
-                    # Parse items inside the top-level JSON structure
-                    parser = items(buffer, "items.item")
-                    for page in parser:
-                        # Each page is a dictionary
-                        if isinstance(page, dict):
-                            page_number = page.get("page_number")
-                            for para in page.get("paragraphs", []):
-                                yield {
-                                    "page_number": page_number,
-                                    "paragraph_number": para.get("paragraph_number"),
-                                    "text": para.get("content", "").strip(),
-                                }
-
-                    buffer = b""
-
-                except common.IncompleteJSONError:
-                    # Wait for more data (partial JSON)
-                    continue
-
-            logger.info("✅ Completed streaming JSON items from blob")
+            reader = AsyncChunkReader(azure_blob_storage_instance.stream_blob_chunks(blob_name))
+
+            async for page in ijson.items_async(reader, "items.item", use_float=True):
+                # Each page is a dictionary
+                if isinstance(page, dict):
+                    page_number = page.get("page_number")
+                    for para in page.get("paragraphs", []):
+                        yield {
+                            "page_number": page_number,
+                            "paragraph_number": para.get("paragraph_number"),
+                            "text": (para.get("content") or "").strip(),
+                        }
+
+            logger.info(f"✅ Completed streaming JSON items from blob ({reader.bytes_read} bytes)")
 
         except Exception as e:
             logger.error(f"❌ Error reading blob content: {e}", exc_info=True)